@@ -12,62 +12,174 @@ void LSA_Data::assign(int shift, VectorDouble x, VectorDouble y){
   Y.assign(y.begin(),y.end());
 }
 
-LSA_Result DP_lsa( const LSA_Data& data, bool keep_trace ){  //python does not support default value
-  LSA_Result lsa_result;
-  int max_p[2]={0}; int porn=0;
+//// banded DP kernel
+//only the 2*max_shift+1 diagonals |i-j|<=max_shift of the score matrices are ever touched
+//and each cell only depends on its predecessor (i-1,j-1) on the same diagonal, so keeping
+//one positive/negative score per diagonal and rolling it along i reproduces psm/nsm exactly.
+//the trace is kept as the number of consecutive non-zero cells on each diagonal.
+struct LSA_Cell {
+  double ps; double ns;   //positive/negative score of the current cell on the diagonal
+  int pl; int nl;         //length of the non-zero run ending at the current cell
+};
+
+static const int LSA_BAND_STACK = 64; //bands up to this width need no heap allocation
+
+//keep_end=false is the score-only variant used by permutation and bootstrap loops
+template <bool keep_end>
+static double lsa_band( const double* X, int x_size, const double* Y, int y_size, int max_shift,
+    int* end_x, int* end_y, int* length ){
+  int shift = std::min(max_shift, std::max(x_size, y_size)); //wider bands add no cells
+  int band = (shift < 0) ? 0 : 2*shift+1;
+  LSA_Cell stack_cells[LSA_BAND_STACK];
+  vector<LSA_Cell> heap_cells;
+  LSA_Cell* cells = stack_cells;
+  if ( band > LSA_BAND_STACK ) { heap_cells.resize(band); cells = &heap_cells[0]; }
+  for( int d=0; d<band; d++ ) { cells[d].ps=0.; cells[d].ns=0.; cells[d].pl=0; cells[d].nl=0; }
+
+  int max_p[2]={0}; int max_l=0; int porn=0;
   double max_s=-std::numeric_limits<double>::infinity(); //initialize to negative infinite
-  //MatrixDouble psm; MatrixDouble nsm;
-  MatrixDouble psm = vector<vector<double> >(data.X.size()+1, vector<double>(data.Y.size()+1));
-  MatrixDouble nsm = vector<vector<double> >(data.X.size()+1, vector<double>(data.Y.size()+1));
-  //double psm[data.X.size()+1][data.Y.size()+1]; // positive score matrix
-  //cout << "here" <<endl;
-  //double nsm[data.X.size()+1][data.Y.size()+1]; // negative score matrix
-  //cout << data.X.size() <<endl;
-  //cout << data.X.size() <<endl;
-  //for( unsigned int i=0; i<=data.X.size(); i++ )
-  //  for( unsigned int j=0; j<=data.Y.size(); j++ )
-  //    { psm[i][j]=0.; nsm[i][j]=0.; } //initialize score matrix elements to 0
-  //int tm[data.X.size()+1][data.Y.size()+1]; // trace matrix
-  //for( unsigned int i=0; i<=data.X.size(); i++ )
-  //  for( unsigned int j=0; j<=data.Y.size(); j++ )
-  //    tm[i][j]=0; //initialize trace matrix elements to 0
-                        //0x0??? for the moving direction, no gap <=> only 0x0000 and 0x0111
-  //cout << tm[3][4][5] << endl;
-  for( unsigned int i=1; i<=data.X.size(); i++)
-    for( unsigned int j=std::max(1,(int)i-data.max_shift); (int)j<=std::min((int)data.Y.size(),(int)i+data.max_shift); j++ ){
-        //if( abs((int)(i-j))>data.max_shift ) continue; // alignment not allowed
-        double s1=data.X[i-1]*data.Y[j-1];
-        //double s0=sm[i-1][j-1];
-        psm[i][j] = std::max(0., psm[i-1][j-1]+s1);
-        nsm[i][j] = std::max(0., nsm[i-1][j-1]-s1);
-        if ( psm[i][j] >= max_s ) {
-          max_p[0] = i; max_p[1] = j; max_s = psm[i][j]; porn=1;
-        }
-        if ( nsm[i][j] >= max_s ) {
-          max_p[0] = i; max_p[1] = j; max_s = nsm[i][j]; porn=-1;
-        }
+  for( int i=1; i<=x_size; i++ )
+    for( int j=std::max(1,i-shift); j<=std::min(y_size,i+shift); j++ ){
+      LSA_Cell& c = cells[j-i+shift];
+      double s1=X[i-1]*Y[j-1];
+      c.ps = std::max(0., c.ps+s1);
+      c.ns = std::max(0., c.ns-s1);
+      if ( keep_end ) {
+        c.pl = (c.ps!=0.) ? c.pl+1 : 0;
+        c.nl = (c.ns!=0.) ? c.nl+1 : 0;
       }
-  //calculation of the score matrix
-  //cout << "max_s=" << max_s << ";max_p="<< max_p[0] <<","<<max_p[1]<<endl;
-  int length=0; vector<int> step; step.push_back(max_p[0]); step.push_back(max_p[1]);
-  if (porn == -1) {
-    lsa_result.score=-1*nsm[max_p[0]][max_p[1]]/data.X.size();      //though it is not enforced, assert(len(X)==len(Y))
-    //cout<<"porn="<<porn<<":score="<<lsa_result.score<<endl;
-    while(nsm[max_p[0]-length][max_p[1]-length]!=0. && keep_trace == true) { 
-      length++; lsa_result.trace.push_back(step); step.clear(); 
-      step.push_back(max_p[0]-length); step.push_back(max_p[1]-length); }
-  }
-  else {
-    lsa_result.score=psm[max_p[0]][max_p[1]]/data.X.size();         //though it is not enforced, assert(len(X)==len(Y))
-    //cout<<"porn="<<porn<<":score="<<lsa_result.score<<endl;
-    while(psm[max_p[0]-length][max_p[1]-length]!=0. && keep_trace == true) { 
-      length++; lsa_result.trace.push_back(step); step.clear(); 
-      step.push_back(max_p[0]-length); step.push_back(max_p[1]-length); }
+      if ( c.ps >= max_s ) {
+        if ( keep_end ) { max_p[0] = i; max_p[1] = j; max_l = c.pl; }
+        max_s = c.ps; porn=1;
+      }
+      if ( c.ns >= max_s ) {
+        if ( keep_end ) { max_p[0] = i; max_p[1] = j; max_l = c.nl; }
+        max_s = c.ns; porn=-1;
+      }
+    }
+  if ( keep_end ) { *end_x = max_p[0]; *end_y = max_p[1]; *length = max_l; }
+  if (porn == -1)
+    return -1*max_s/x_size;           //though it is not enforced, assert(len(X)==len(Y))
+  else if (porn == 1)
+    return max_s/x_size;
+  return 0./x_size;                   //nothing aligned, same as reading psm[0][0]
+}
+
+LSA_Result DP_lsa( const LSA_Data& data, bool keep_trace ){  //python does not support default value
+  LSA_Result lsa_result;
+  int end_p[2]={0}; int length=0;
+  lsa_result.score = lsa_band<true>( data.X.data(), data.X.size(), data.Y.data(), data.Y.size(),
+      data.max_shift, &end_p[0], &end_p[1], &length );
+  for( int k=0; k<length && keep_trace == true; k++ ){ //expand to steps from the end backwards
+    vector<int> step; step.push_back(end_p[0]-k); step.push_back(end_p[1]-k);
+    lsa_result.trace.push_back(step);
   }
-  //cout << "length="<<lsa_result.trace.size()<< endl;
   return lsa_result;
 }
 
+double DP_lsa_score( const LSA_Data& data ){  //score only, no trace and no result object
+  return lsa_band<false>( data.X.data(), data.X.size(), data.Y.data(), data.Y.size(),
+      data.max_shift, NULL, NULL, NULL );
+}
+
+//// permutation test
+//shuffles Y and reruns the score-only kernel perm_num times without returning to python.
+//only valid when normalizing a permuted series equals permuting the normalized series,
+//i.e. for the rank based normalizations; the caller decides that.
+//std::shuffle and the std distributions are implementation defined, so the shuffle is done
+//with mt19937 (fully specified) and rejection sampling to give the same null everywhere
+static unsigned int draw_below( std::mt19937& gen, unsigned int n ){
+  unsigned int limit = 0xFFFFFFFFu - (0xFFFFFFFFu % n + 1) % n; //largest unbiased draw
+  unsigned int r;
+  do { r = gen(); } while ( r > limit );
+  return r % n;
+}
+
+static void lsa_perm( const double* X, int x_size, const double* Y, int y_size, int max_shift,
+    unsigned int seed, double* null_scores, int perm_num ){
+  VectorDouble Yp( Y, Y+y_size );    //shuffled in place, one permutation after another
+  std::mt19937 gen( seed );
+  for( int p=0; p<perm_num; p++ ){
+    for( int k=y_size-1; k>0; k-- )
+      std::swap( Yp[k], Yp[draw_below(gen, k+1)] );
+    null_scores[p] = lsa_band<false>( X, x_size, Yp.data(), y_size, max_shift, NULL, NULL, NULL );
+  }
+}
+
+VectorDouble DP_lsa_perm( const LSA_Data& data, int perm_num, unsigned int seed ){
+  VectorDouble null_scores( std::max(perm_num,0) );
+  lsa_perm( data.X.data(), data.X.size(), data.Y.data(), data.Y.size(), data.max_shift,
+      seed, null_scores.data(), perm_num );
+  return null_scores;
+}
+
+//// buffer interface
+//same kernels reading contiguous float64 buffers in place (see the typemaps in compcore.i),
+//the alignment comes back as 1-based start positions and length, (0,0,0) if nothing aligned
+double DP_lsa_buf( const double* X, int x_size, const double* Y, int y_size, int max_shift,
+    int* x_start, int* y_start, int* length ){
+  int end_x=0; int end_y=0;
+  double score = lsa_band<true>( X, x_size, Y, y_size, max_shift, &end_x, &end_y, length );
+  *x_start = (*length > 0) ? end_x-*length+1 : 0;
+  *y_start = (*length > 0) ? end_y-*length+1 : 0;
+  return score;
+}
+
+double DP_lsa_score_buf( const double* X, int x_size, const double* Y, int y_size, int max_shift ){
+  return lsa_band<false>( X, x_size, Y, y_size, max_shift, NULL, NULL, NULL );
+}
+
+void DP_lsa_perm_buf( const double* X, int x_size, const double* Y, int y_size, int max_shift,
+    unsigned int seed, double* null_scores, int perm_num ){
+  lsa_perm( X, x_size, Y, y_size, max_shift, seed, null_scores, perm_num );
+}
+
+
+//// threaded batch
+//scores many pairs of rows of two row-major (factors x spot_num) matrices of normalized series,
+//pairs is a flat list of (row in X, row in Y); pairs are handed out to the threads in small
+//chunks from a shared counter, each pair writes its own score and (Xs, Ys, Al) slots.
+//runs without the GIL, so no python objects are touched in here
+static const int LSA_BATCH_CHUNK = 16;
+
+static void lsa_batch_worker( const double* X, const double* Y, int spot_num, const int* pairs,
+    int pair_num, int max_shift, double* scores, int* aligns, std::atomic<int>* next ){
+  for( int begin=next->fetch_add(LSA_BATCH_CHUNK); begin<pair_num;
+      begin=next->fetch_add(LSA_BATCH_CHUNK) )
+    for( int k=begin; k<std::min(begin+LSA_BATCH_CHUNK, pair_num); k++ )
+      scores[k] = DP_lsa_buf( X+(size_t)pairs[2*k]*spot_num, spot_num,
+          Y+(size_t)pairs[2*k+1]*spot_num, spot_num, max_shift,
+          &aligns[3*k], &aligns[3*k+1], &aligns[3*k+2] );
+}
+
+void DP_lsa_batch( const double* X, int x_size, const double* Y, int y_size, int spot_num,
+    const int* pairs, int pair_size, int max_shift, int thread_num,
+    double* scores, int score_size, int* aligns, int align_size ){
+  if ( pair_size == 0 ) return;  //nothing to align, whatever the matrices
+  if ( spot_num <= 0 || x_size % spot_num != 0 || y_size % spot_num != 0 )
+    throw std::invalid_argument("factor matrices are not a multiple of spot_num");
+  if ( pair_size % 2 != 0 )
+    throw std::invalid_argument("pairs must be (row in X, row in Y) tuples");
+  int pair_num = pair_size/2;
+  if ( score_size < pair_num || align_size < 3*pair_num )
+    throw std::invalid_argument("output buffers are shorter than the number of pairs");
+  for( int k=0; k<pair_num; k++ )
+    if ( pairs[2*k] < 0 || pairs[2*k] >= x_size/spot_num
+        || pairs[2*k+1] < 0 || pairs[2*k+1] >= y_size/spot_num )
+      throw std::invalid_argument("pair index out of range");
+
+  if ( thread_num <= 0 ) thread_num = std::max(1u, std::thread::hardware_concurrency());
+  thread_num = std::min(thread_num, (pair_num+LSA_BATCH_CHUNK-1)/LSA_BATCH_CHUNK);
+  std::atomic<int> next(0);
+  vector<std::thread> pool;
+  for( int t=1; t<thread_num; t++ )
+    pool.push_back( std::thread(lsa_batch_worker, X, Y, spot_num, pairs, pair_num, max_shift,
+        scores, aligns, &next) );
+  lsa_batch_worker( X, Y, spot_num, pairs, pair_num, max_shift, scores, aligns, &next );
+  for( unsigned int t=0; t<pool.size(); t++ )
+    pool[t].join();
+}
+
 
 //definitions of functions
 LLA_Result DP_lla( const LLA_Data& data ){
@@ -4,6 +4,10 @@
 #include <cmath>
 #include <algorithm>
 #include <limits>
+#include <random>
+#include <thread>
+#include <atomic>
+#include <stdexcept>
 //#include <numeric>
 
 using namespace std;
@@ -41,6 +45,18 @@ public:
 };
 
 LSA_Result DP_lsa( const LSA_Data&, bool ); 
+double DP_lsa_score( const LSA_Data& );
+VectorDouble DP_lsa_perm( const LSA_Data&, int, unsigned int );
+
+//// buffer interface, reads contiguous float64 buffers in place
+double DP_lsa_buf( const double* X, int x_size, const double* Y, int y_size, int max_shift,
+    int* x_start, int* y_start, int* length );
+double DP_lsa_score_buf( const double* X, int x_size, const double* Y, int y_size, int max_shift );
+void DP_lsa_perm_buf( const double* X, int x_size, const double* Y, int y_size, int max_shift,
+    unsigned int seed, double* null_scores, int perm_num );
+void DP_lsa_batch( const double* X, int x_size, const double* Y, int y_size, int spot_num,
+    const int* pairs, int pair_size, int max_shift, int thread_num,
+    double* scores, int score_size, int* aligns, int align_size );
 
 
 //// LLA and LA data types
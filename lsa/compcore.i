@@ -1,5 +1,27 @@
-%module compcore
+%module(threads="1") compcore
+
+/* the kernels release the GIL while they run, everything else keeps it */
+%nothread;
+%thread DP_lsa;
+%thread DP_lsa_score;
+%thread DP_lsa_perm;
+%thread DP_lsa_buf;
+%thread DP_lsa_score_buf;
+%thread DP_lsa_perm_buf;
+%thread DP_lsa_batch;
+%thread calc_LA;
+
 %include "std_vector.i"
+%include "typemaps.i"
+%include "exception.i"
+
+%exception DP_lsa_batch {
+  try {
+    $action
+  } catch (const std::invalid_argument& e) {
+    SWIG_exception(SWIG_ValueError, e.what());
+  }
+}
 %{
 #include "compcore.hpp"
 %}
@@ -9,6 +31,57 @@ namespace std{
     %template(MatrixDouble) vector<vector<double> >;
     %template(MatrixInt) vector<vector<int> >;
 };
+
+/* buffer protocol typemaps: numpy float64 arrays are read (or written) in place */
+%fragment("compcore_buffer", "header") %{
+static int compcore_get_buffer(PyObject* obj, Py_buffer* view, int flags,
+    Py_ssize_t itemsize, const char* codes, const char* expected){
+  if (PyObject_GetBuffer(obj, view, flags | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+    return -1;
+  if (view->itemsize != itemsize || view->format == NULL || view->format[0] == 0
+      || strchr(codes, view->format[strlen(view->format)-1]) == NULL) {
+    PyBuffer_Release(view);
+    PyErr_Format(PyExc_TypeError, "expected a C contiguous %s array", expected);
+    return -1;
+  }
+  return 0;
+}
+#define compcore_get_doubles(obj, view, flags) \
+  compcore_get_buffer(obj, view, flags, sizeof(double), "d", "float64")
+#define compcore_get_ints(obj, view, flags) \
+  compcore_get_buffer(obj, view, flags, sizeof(int), "il", "int32")
+%}
+
+%typemap(in, fragment="compcore_buffer") (const double* BUF, int BUF_SIZE) (Py_buffer view = {}) {
+  if (compcore_get_doubles($input, &view, PyBUF_SIMPLE) != 0) SWIG_fail;
+  $1 = (double*) view.buf;
+  $2 = (int) (view.len / sizeof(double));
+}
+%typemap(in, fragment="compcore_buffer") (double* OUT_BUF, int OUT_SIZE) (Py_buffer view = {}) {
+  if (compcore_get_doubles($input, &view, PyBUF_WRITABLE) != 0) SWIG_fail;
+  $1 = (double*) view.buf;
+  $2 = (int) (view.len / sizeof(double));
+}
+%typemap(in, fragment="compcore_buffer") (const int* IBUF, int IBUF_SIZE) (Py_buffer view = {}) {
+  if (compcore_get_ints($input, &view, PyBUF_SIMPLE) != 0) SWIG_fail;
+  $1 = (int*) view.buf;
+  $2 = (int) (view.len / sizeof(int));
+}
+%typemap(in, fragment="compcore_buffer") (int* OUT_IBUF, int OUT_ISIZE) (Py_buffer view = {}) {
+  if (compcore_get_ints($input, &view, PyBUF_WRITABLE) != 0) SWIG_fail;
+  $1 = (int*) view.buf;
+  $2 = (int) (view.len / sizeof(int));
+}
+%typemap(freearg) (const double* BUF, int BUF_SIZE), (double* OUT_BUF, int OUT_SIZE),
+    (const int* IBUF, int IBUF_SIZE), (int* OUT_IBUF, int OUT_ISIZE) {
+  if (view$argnum.obj) PyBuffer_Release(&view$argnum);
+}
+
+%apply (const double* BUF, int BUF_SIZE) { (const double* X, int x_size), (const double* Y, int y_size) };
+%apply (double* OUT_BUF, int OUT_SIZE) { (double* null_scores, int perm_num), (double* scores, int score_size) };
+%apply (const int* IBUF, int IBUF_SIZE) { (const int* pairs, int pair_size) };
+%apply (int* OUT_IBUF, int OUT_ISIZE) { (int* aligns, int align_size) };
+%apply int* OUTPUT { int* x_start, int* y_start, int* length };
 %include "compcore.hpp"  
 
 /*
@@ -585,6 +585,24 @@ _compcore.LSA_Result_swigregister(LSA_Result)
 
 def DP_lsa(arg1, arg2):
     return _compcore.DP_lsa(arg1, arg2)
+
+def DP_lsa_score(arg1):
+    return _compcore.DP_lsa_score(arg1)
+
+def DP_lsa_perm(arg1, arg2, arg3):
+    return _compcore.DP_lsa_perm(arg1, arg2, arg3)
+
+def DP_lsa_buf(X, Y, max_shift):
+    return _compcore.DP_lsa_buf(X, Y, max_shift)
+
+def DP_lsa_score_buf(X, Y, max_shift):
+    return _compcore.DP_lsa_score_buf(X, Y, max_shift)
+
+def DP_lsa_perm_buf(X, Y, max_shift, seed, null_scores):
+    return _compcore.DP_lsa_perm_buf(X, Y, max_shift, seed, null_scores)
+
+def DP_lsa_batch(X, Y, spot_num, pairs, max_shift, thread_num, scores, aligns):
+    return _compcore.DP_lsa_batch(X, Y, spot_num, pairs, max_shift, thread_num, scores, aligns)
 class LLA_Data(object):
     thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
     __repr__ = _swig_repr
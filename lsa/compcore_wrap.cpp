@@ -13,6 +13,7 @@
 #define SWIGPYTHON
 #endif
 
+#define SWIG_PYTHON_THREADS
 #define SWIG_PYTHON_DIRECTOR_NO_VTABLE
 
 
@@ -2699,21 +2700,23 @@ SWIGINTERN PyObject *SWIG_PyStaticMethod_New(PyObject *SWIGUNUSEDPARM(self), PyO
 #define SWIGTYPE_p_allocator_type swig_types[4]
 #define SWIGTYPE_p_char swig_types[5]
 #define SWIGTYPE_p_difference_type swig_types[6]
-#define SWIGTYPE_p_p_PyObject swig_types[7]
-#define SWIGTYPE_p_size_type swig_types[8]
-#define SWIGTYPE_p_std__allocatorT_double_t swig_types[9]
-#define SWIGTYPE_p_std__allocatorT_int_t swig_types[10]
-#define SWIGTYPE_p_std__allocatorT_std__vectorT_double_std__allocatorT_double_t_t_t swig_types[11]
-#define SWIGTYPE_p_std__allocatorT_std__vectorT_int_std__allocatorT_int_t_t_t swig_types[12]
-#define SWIGTYPE_p_std__invalid_argument swig_types[13]
-#define SWIGTYPE_p_std__vectorT_double_std__allocatorT_double_t_t swig_types[14]
-#define SWIGTYPE_p_std__vectorT_int_std__allocatorT_int_t_t swig_types[15]
-#define SWIGTYPE_p_std__vectorT_std__vectorT_double_std__allocatorT_double_t_t_std__allocatorT_std__vectorT_double_std__allocatorT_double_t_t_t_t swig_types[16]
-#define SWIGTYPE_p_std__vectorT_std__vectorT_int_std__allocatorT_int_t_t_std__allocatorT_std__vectorT_int_std__allocatorT_int_t_t_t_t swig_types[17]
-#define SWIGTYPE_p_swig__SwigPyIterator swig_types[18]
-#define SWIGTYPE_p_value_type swig_types[19]
-static swig_type_info *swig_types[21];
-static swig_module_info swig_module = {swig_types, 20, 0, 0, 0, 0};
+#define SWIGTYPE_p_double swig_types[7]
+#define SWIGTYPE_p_int swig_types[8]
+#define SWIGTYPE_p_p_PyObject swig_types[9]
+#define SWIGTYPE_p_size_type swig_types[10]
+#define SWIGTYPE_p_std__allocatorT_double_t swig_types[11]
+#define SWIGTYPE_p_std__allocatorT_int_t swig_types[12]
+#define SWIGTYPE_p_std__allocatorT_std__vectorT_double_std__allocatorT_double_t_t_t swig_types[13]
+#define SWIGTYPE_p_std__allocatorT_std__vectorT_int_std__allocatorT_int_t_t_t swig_types[14]
+#define SWIGTYPE_p_std__invalid_argument swig_types[15]
+#define SWIGTYPE_p_std__vectorT_double_std__allocatorT_double_t_t swig_types[16]
+#define SWIGTYPE_p_std__vectorT_int_std__allocatorT_int_t_t swig_types[17]
+#define SWIGTYPE_p_std__vectorT_std__vectorT_double_std__allocatorT_double_t_t_std__allocatorT_std__vectorT_double_std__allocatorT_double_t_t_t_t swig_types[18]
+#define SWIGTYPE_p_std__vectorT_std__vectorT_int_std__allocatorT_int_t_t_std__allocatorT_std__vectorT_int_std__allocatorT_int_t_t_t_t swig_types[19]
+#define SWIGTYPE_p_swig__SwigPyIterator swig_types[20]
+#define SWIGTYPE_p_value_type swig_types[21]
+static swig_type_info *swig_types[23];
+static swig_module_info swig_module = {swig_types, 22, 0, 0, 0, 0};
 #define SWIG_TypeQuery(name) SWIG_TypeQueryModule(&swig_module, &swig_module, name)
 #define SWIG_MangledTypeQuery(name) SWIG_MangledTypeQueryModule(&swig_module, &swig_module, name)
 
@@ -5069,6 +5072,40 @@ SWIG_AsVal_bool (PyObject *obj, bool *val)
   return SWIG_OK;
 }
 
+
+SWIGINTERN int
+SWIG_AsVal_unsigned_SS_int (PyObject * obj, unsigned int *val)
+{
+  unsigned long v;
+  int res = SWIG_AsVal_unsigned_SS_long (obj, &v);
+  if (SWIG_IsOK(res)) {
+    if ((v > UINT_MAX)) {
+      return SWIG_OverflowError;
+    } else {
+      if (val) *val = static_cast< unsigned int >(v);
+    }
+  }  
+  return res;
+}
+
+
+static int compcore_get_buffer(PyObject* obj, Py_buffer* view, int flags,
+    Py_ssize_t itemsize, const char* codes, const char* expected){
+  if (PyObject_GetBuffer(obj, view, flags | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+    return -1;
+  if (view->itemsize != itemsize || view->format == NULL || view->format[0] == 0
+      || strchr(codes, view->format[strlen(view->format)-1]) == NULL) {
+    PyBuffer_Release(view);
+    PyErr_Format(PyExc_TypeError, "expected a C contiguous %s array", expected);
+    return -1;
+  }
+  return 0;
+}
+#define compcore_get_doubles(obj, view, flags) \
+  compcore_get_buffer(obj, view, flags, sizeof(double), "d", "float64")
+#define compcore_get_ints(obj, view, flags) \
+  compcore_get_buffer(obj, view, flags, sizeof(int), "il", "int32")
+
 #ifdef __cplusplus
 extern "C" {
 #endif
@@ -13283,7 +13320,11 @@ SWIGINTERN PyObject *_wrap_calc_LA(PyObject *SWIGUNUSEDPARM(self), PyObject *arg
     arg3 = *ptr;
     if (SWIG_IsNewObj(res)) delete ptr;
   }
-  result = (double)calc_LA(arg1,arg2,arg3);
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    result = (double)calc_LA(arg1,arg2,arg3);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
   resultobj = SWIG_From_double(static_cast< double >(result));
   return resultobj;
 fail:
@@ -13797,7 +13838,11 @@ SWIGINTERN PyObject *_wrap_DP_lsa(PyObject *SWIGUNUSEDPARM(self), PyObject *args
     SWIG_exception_fail(SWIG_ArgError(ecode2), "in method '" "DP_lsa" "', argument " "2"" of type '" "bool""'");
   } 
   arg2 = static_cast< bool >(val2);
-  result = DP_lsa((LSA_Data const &)*arg1,arg2);
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    result = DP_lsa((LSA_Data const &)*arg1,arg2);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
   resultobj = SWIG_NewPointerObj((new LSA_Result(static_cast< const LSA_Result& >(result))), SWIGTYPE_p_LSA_Result, SWIG_POINTER_OWN |  0 );
   return resultobj;
 fail:
@@ -13805,6 +13850,435 @@ fail:
 }
 
 
+SWIGINTERN PyObject *_wrap_DP_lsa_score(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
+  PyObject *resultobj = 0;
+  LSA_Data *arg1 = 0 ;
+  void *argp1 = 0 ;
+  int res1 = 0 ;
+  PyObject *swig_obj[1] ;
+  double result;
+  
+  if (!args) SWIG_fail;
+  swig_obj[0] = args;
+  res1 = SWIG_ConvertPtr(swig_obj[0], &argp1, SWIGTYPE_p_LSA_Data,  0  | 0);
+  if (!SWIG_IsOK(res1)) {
+    SWIG_exception_fail(SWIG_ArgError(res1), "in method '" "DP_lsa_score" "', argument " "1"" of type '" "LSA_Data const &""'"); 
+  }
+  if (!argp1) {
+    SWIG_exception_fail(SWIG_ValueError, "invalid null reference " "in method '" "DP_lsa_score" "', argument " "1"" of type '" "LSA_Data const &""'"); 
+  }
+  arg1 = reinterpret_cast< LSA_Data * >(argp1);
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    result = (double)DP_lsa_score((LSA_Data const &)*arg1);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
+  resultobj = SWIG_From_double(static_cast< double >(result));
+  return resultobj;
+fail:
+  return NULL;
+}
+
+
+SWIGINTERN PyObject *_wrap_DP_lsa_perm(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
+  PyObject *resultobj = 0;
+  LSA_Data *arg1 = 0 ;
+  int arg2 ;
+  unsigned int arg3 ;
+  void *argp1 = 0 ;
+  int res1 = 0 ;
+  int val2 ;
+  int ecode2 = 0 ;
+  unsigned int val3 ;
+  int ecode3 = 0 ;
+  PyObject *swig_obj[3] ;
+  VectorDouble result;
+  
+  if (!SWIG_Python_UnpackTuple(args, "DP_lsa_perm", 3, 3, swig_obj)) SWIG_fail;
+  res1 = SWIG_ConvertPtr(swig_obj[0], &argp1, SWIGTYPE_p_LSA_Data,  0  | 0);
+  if (!SWIG_IsOK(res1)) {
+    SWIG_exception_fail(SWIG_ArgError(res1), "in method '" "DP_lsa_perm" "', argument " "1"" of type '" "LSA_Data const &""'"); 
+  }
+  if (!argp1) {
+    SWIG_exception_fail(SWIG_ValueError, "invalid null reference " "in method '" "DP_lsa_perm" "', argument " "1"" of type '" "LSA_Data const &""'"); 
+  }
+  arg1 = reinterpret_cast< LSA_Data * >(argp1);
+  ecode2 = SWIG_AsVal_int(swig_obj[1], &val2);
+  if (!SWIG_IsOK(ecode2)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode2), "in method '" "DP_lsa_perm" "', argument " "2"" of type '" "int""'");
+  } 
+  arg2 = static_cast< int >(val2);
+  ecode3 = SWIG_AsVal_unsigned_SS_int(swig_obj[2], &val3);
+  if (!SWIG_IsOK(ecode3)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode3), "in method '" "DP_lsa_perm" "', argument " "3"" of type '" "unsigned int""'");
+  } 
+  arg3 = static_cast< unsigned int >(val3);
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    result = DP_lsa_perm((LSA_Data const &)*arg1,arg2,arg3);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
+  resultobj = swig::from(static_cast< std::vector< double,std::allocator< double > > >(result));
+  return resultobj;
+fail:
+  return NULL;
+}
+
+
+SWIGINTERN PyObject *_wrap_DP_lsa_buf(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
+  PyObject *resultobj = 0;
+  double *arg1 = (double *) 0 ;
+  int arg2 ;
+  double *arg3 = (double *) 0 ;
+  int arg4 ;
+  int arg5 ;
+  int *arg6 = (int *) 0 ;
+  int *arg7 = (int *) 0 ;
+  int *arg8 = (int *) 0 ;
+  Py_buffer view1 = {
+    
+  } ;
+  Py_buffer view3 = {
+    
+  } ;
+  int val5 ;
+  int ecode5 = 0 ;
+  int temp6 ;
+  int res6 = SWIG_TMPOBJ ;
+  int temp7 ;
+  int res7 = SWIG_TMPOBJ ;
+  int temp8 ;
+  int res8 = SWIG_TMPOBJ ;
+  PyObject *swig_obj[3] ;
+  double result;
+  
+  arg6 = &temp6;
+  arg7 = &temp7;
+  arg8 = &temp8;
+  if (!SWIG_Python_UnpackTuple(args, "DP_lsa_buf", 3, 3, swig_obj)) SWIG_fail;
+  {
+    if (compcore_get_doubles(swig_obj[0], &view1, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg1 = (double*) view1.buf;
+    arg2 = (int) (view1.len / sizeof(double));
+  }
+  {
+    if (compcore_get_doubles(swig_obj[1], &view3, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg3 = (double*) view3.buf;
+    arg4 = (int) (view3.len / sizeof(double));
+  }
+  ecode5 = SWIG_AsVal_int(swig_obj[2], &val5);
+  if (!SWIG_IsOK(ecode5)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode5), "in method '" "DP_lsa_buf" "', argument " "5"" of type '" "int""'");
+  } 
+  arg5 = static_cast< int >(val5);
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    result = (double)DP_lsa_buf((double const *)arg1,arg2,(double const *)arg3,arg4,arg5,arg6,arg7,arg8);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
+  resultobj = SWIG_From_double(static_cast< double >(result));
+  if (SWIG_IsTmpObj(res6)) {
+    resultobj = SWIG_Python_AppendOutput(resultobj, SWIG_From_int((*arg6)));
+  } else {
+    int new_flags = SWIG_IsNewObj(res6) ? (SWIG_POINTER_OWN |  0 ) :  0 ;
+    resultobj = SWIG_Python_AppendOutput(resultobj, SWIG_NewPointerObj((void*)(arg6), SWIGTYPE_p_int, new_flags));
+  }
+  if (SWIG_IsTmpObj(res7)) {
+    resultobj = SWIG_Python_AppendOutput(resultobj, SWIG_From_int((*arg7)));
+  } else {
+    int new_flags = SWIG_IsNewObj(res7) ? (SWIG_POINTER_OWN |  0 ) :  0 ;
+    resultobj = SWIG_Python_AppendOutput(resultobj, SWIG_NewPointerObj((void*)(arg7), SWIGTYPE_p_int, new_flags));
+  }
+  if (SWIG_IsTmpObj(res8)) {
+    resultobj = SWIG_Python_AppendOutput(resultobj, SWIG_From_int((*arg8)));
+  } else {
+    int new_flags = SWIG_IsNewObj(res8) ? (SWIG_POINTER_OWN |  0 ) :  0 ;
+    resultobj = SWIG_Python_AppendOutput(resultobj, SWIG_NewPointerObj((void*)(arg8), SWIGTYPE_p_int, new_flags));
+  }
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  return resultobj;
+fail:
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  return NULL;
+}
+
+
+SWIGINTERN PyObject *_wrap_DP_lsa_score_buf(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
+  PyObject *resultobj = 0;
+  double *arg1 = (double *) 0 ;
+  int arg2 ;
+  double *arg3 = (double *) 0 ;
+  int arg4 ;
+  int arg5 ;
+  Py_buffer view1 = {
+    
+  } ;
+  Py_buffer view3 = {
+    
+  } ;
+  int val5 ;
+  int ecode5 = 0 ;
+  PyObject *swig_obj[3] ;
+  double result;
+  
+  if (!SWIG_Python_UnpackTuple(args, "DP_lsa_score_buf", 3, 3, swig_obj)) SWIG_fail;
+  {
+    if (compcore_get_doubles(swig_obj[0], &view1, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg1 = (double*) view1.buf;
+    arg2 = (int) (view1.len / sizeof(double));
+  }
+  {
+    if (compcore_get_doubles(swig_obj[1], &view3, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg3 = (double*) view3.buf;
+    arg4 = (int) (view3.len / sizeof(double));
+  }
+  ecode5 = SWIG_AsVal_int(swig_obj[2], &val5);
+  if (!SWIG_IsOK(ecode5)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode5), "in method '" "DP_lsa_score_buf" "', argument " "5"" of type '" "int""'");
+  } 
+  arg5 = static_cast< int >(val5);
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    result = (double)DP_lsa_score_buf((double const *)arg1,arg2,(double const *)arg3,arg4,arg5);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
+  resultobj = SWIG_From_double(static_cast< double >(result));
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  return resultobj;
+fail:
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  return NULL;
+}
+
+
+SWIGINTERN PyObject *_wrap_DP_lsa_perm_buf(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
+  PyObject *resultobj = 0;
+  double *arg1 = (double *) 0 ;
+  int arg2 ;
+  double *arg3 = (double *) 0 ;
+  int arg4 ;
+  int arg5 ;
+  unsigned int arg6 ;
+  double *arg7 = (double *) 0 ;
+  int arg8 ;
+  Py_buffer view1 = {
+    
+  } ;
+  Py_buffer view3 = {
+    
+  } ;
+  int val5 ;
+  int ecode5 = 0 ;
+  unsigned int val6 ;
+  int ecode6 = 0 ;
+  Py_buffer view7 = {
+    
+  } ;
+  PyObject *swig_obj[5] ;
+  
+  if (!SWIG_Python_UnpackTuple(args, "DP_lsa_perm_buf", 5, 5, swig_obj)) SWIG_fail;
+  {
+    if (compcore_get_doubles(swig_obj[0], &view1, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg1 = (double*) view1.buf;
+    arg2 = (int) (view1.len / sizeof(double));
+  }
+  {
+    if (compcore_get_doubles(swig_obj[1], &view3, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg3 = (double*) view3.buf;
+    arg4 = (int) (view3.len / sizeof(double));
+  }
+  ecode5 = SWIG_AsVal_int(swig_obj[2], &val5);
+  if (!SWIG_IsOK(ecode5)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode5), "in method '" "DP_lsa_perm_buf" "', argument " "5"" of type '" "int""'");
+  } 
+  arg5 = static_cast< int >(val5);
+  ecode6 = SWIG_AsVal_unsigned_SS_int(swig_obj[3], &val6);
+  if (!SWIG_IsOK(ecode6)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode6), "in method '" "DP_lsa_perm_buf" "', argument " "6"" of type '" "unsigned int""'");
+  } 
+  arg6 = static_cast< unsigned int >(val6);
+  {
+    if (compcore_get_doubles(swig_obj[4], &view7, PyBUF_WRITABLE) != 0) SWIG_fail;
+    arg7 = (double*) view7.buf;
+    arg8 = (int) (view7.len / sizeof(double));
+  }
+  {
+    SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+    DP_lsa_perm_buf((double const *)arg1,arg2,(double const *)arg3,arg4,arg5,arg6,arg7,arg8);
+    SWIG_PYTHON_THREAD_END_ALLOW;
+  }
+  resultobj = SWIG_Py_Void();
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  {
+    if (view7.obj) PyBuffer_Release(&view7);
+  }
+  return resultobj;
+fail:
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  {
+    if (view7.obj) PyBuffer_Release(&view7);
+  }
+  return NULL;
+}
+
+
+SWIGINTERN PyObject *_wrap_DP_lsa_batch(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
+  PyObject *resultobj = 0;
+  double *arg1 = (double *) 0 ;
+  int arg2 ;
+  double *arg3 = (double *) 0 ;
+  int arg4 ;
+  int arg5 ;
+  int *arg6 = (int *) 0 ;
+  int arg7 ;
+  int arg8 ;
+  int arg9 ;
+  double *arg10 = (double *) 0 ;
+  int arg11 ;
+  int *arg12 = (int *) 0 ;
+  int arg13 ;
+  Py_buffer view1 = {
+    
+  } ;
+  Py_buffer view3 = {
+    
+  } ;
+  int val5 ;
+  int ecode5 = 0 ;
+  Py_buffer view6 = {
+    
+  } ;
+  int val8 ;
+  int ecode8 = 0 ;
+  int val9 ;
+  int ecode9 = 0 ;
+  Py_buffer view10 = {
+    
+  } ;
+  Py_buffer view12 = {
+    
+  } ;
+  PyObject *swig_obj[8] ;
+  
+  if (!SWIG_Python_UnpackTuple(args, "DP_lsa_batch", 8, 8, swig_obj)) SWIG_fail;
+  {
+    if (compcore_get_doubles(swig_obj[0], &view1, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg1 = (double*) view1.buf;
+    arg2 = (int) (view1.len / sizeof(double));
+  }
+  {
+    if (compcore_get_doubles(swig_obj[1], &view3, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg3 = (double*) view3.buf;
+    arg4 = (int) (view3.len / sizeof(double));
+  }
+  ecode5 = SWIG_AsVal_int(swig_obj[2], &val5);
+  if (!SWIG_IsOK(ecode5)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode5), "in method '" "DP_lsa_batch" "', argument " "5"" of type '" "int""'");
+  } 
+  arg5 = static_cast< int >(val5);
+  {
+    if (compcore_get_ints(swig_obj[3], &view6, PyBUF_SIMPLE) != 0) SWIG_fail;
+    arg6 = (int*) view6.buf;
+    arg7 = (int) (view6.len / sizeof(int));
+  }
+  ecode8 = SWIG_AsVal_int(swig_obj[4], &val8);
+  if (!SWIG_IsOK(ecode8)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode8), "in method '" "DP_lsa_batch" "', argument " "8"" of type '" "int""'");
+  } 
+  arg8 = static_cast< int >(val8);
+  ecode9 = SWIG_AsVal_int(swig_obj[5], &val9);
+  if (!SWIG_IsOK(ecode9)) {
+    SWIG_exception_fail(SWIG_ArgError(ecode9), "in method '" "DP_lsa_batch" "', argument " "9"" of type '" "int""'");
+  } 
+  arg9 = static_cast< int >(val9);
+  {
+    if (compcore_get_doubles(swig_obj[6], &view10, PyBUF_WRITABLE) != 0) SWIG_fail;
+    arg10 = (double*) view10.buf;
+    arg11 = (int) (view10.len / sizeof(double));
+  }
+  {
+    if (compcore_get_ints(swig_obj[7], &view12, PyBUF_WRITABLE) != 0) SWIG_fail;
+    arg12 = (int*) view12.buf;
+    arg13 = (int) (view12.len / sizeof(int));
+  }
+  {
+    try {
+      {
+        SWIG_PYTHON_THREAD_BEGIN_ALLOW;
+        DP_lsa_batch((double const *)arg1,arg2,(double const *)arg3,arg4,arg5,(int const *)arg6,arg7,arg8,arg9,arg10,arg11,arg12,arg13);
+        SWIG_PYTHON_THREAD_END_ALLOW;
+      }
+    } catch (const std::invalid_argument& e) {
+      SWIG_exception(SWIG_ValueError, e.what());
+    }
+  }
+  resultobj = SWIG_Py_Void();
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  {
+    if (view6.obj) PyBuffer_Release(&view6);
+  }
+  {
+    if (view10.obj) PyBuffer_Release(&view10);
+  }
+  {
+    if (view12.obj) PyBuffer_Release(&view12);
+  }
+  return resultobj;
+fail:
+  {
+    if (view1.obj) PyBuffer_Release(&view1);
+  }
+  {
+    if (view3.obj) PyBuffer_Release(&view3);
+  }
+  {
+    if (view6.obj) PyBuffer_Release(&view6);
+  }
+  {
+    if (view10.obj) PyBuffer_Release(&view10);
+  }
+  {
+    if (view12.obj) PyBuffer_Release(&view12);
+  }
+  return NULL;
+}
+
+
 SWIGINTERN PyObject *_wrap_LLA_Data_max_shift_set(PyObject *SWIGUNUSEDPARM(self), PyObject *args) {
   PyObject *resultobj = 0;
   LLA_Data *arg1 = (LLA_Data *) 0 ;
@@ -14485,6 +14959,12 @@ static PyMethodDef SwigMethods[] = {
 	 { "LSA_Result_swigregister", LSA_Result_swigregister, METH_O, NULL},
 	 { "LSA_Result_swiginit", LSA_Result_swiginit, METH_VARARGS, NULL},
 	 { "DP_lsa", _wrap_DP_lsa, METH_VARARGS, NULL},
+	 { "DP_lsa_score", _wrap_DP_lsa_score, METH_O, NULL},
+	 { "DP_lsa_perm", _wrap_DP_lsa_perm, METH_VARARGS, NULL},
+	 { "DP_lsa_buf", _wrap_DP_lsa_buf, METH_VARARGS, NULL},
+	 { "DP_lsa_score_buf", _wrap_DP_lsa_score_buf, METH_VARARGS, NULL},
+	 { "DP_lsa_perm_buf", _wrap_DP_lsa_perm_buf, METH_VARARGS, NULL},
+	 { "DP_lsa_batch", _wrap_DP_lsa_batch, METH_VARARGS, NULL},
 	 { "LLA_Data_max_shift_set", _wrap_LLA_Data_max_shift_set, METH_VARARGS, NULL},
 	 { "LLA_Data_max_shift_get", _wrap_LLA_Data_max_shift_get, METH_O, NULL},
 	 { "LLA_Data_X_set", _wrap_LLA_Data_X_set, METH_VARARGS, NULL},
@@ -14522,6 +15002,8 @@ static swig_type_info _swigt__p_LSA_Result = {"_p_LSA_Result", "LSA_Result *", 0
 static swig_type_info _swigt__p_allocator_type = {"_p_allocator_type", "allocator_type *", 0, 0, (void*)0, 0};
 static swig_type_info _swigt__p_char = {"_p_char", "char *", 0, 0, (void*)0, 0};
 static swig_type_info _swigt__p_difference_type = {"_p_difference_type", "difference_type *", 0, 0, (void*)0, 0};
+static swig_type_info _swigt__p_double = {"_p_double", "double *", 0, 0, (void*)0, 0};
+static swig_type_info _swigt__p_int = {"_p_int", "int *", 0, 0, (void*)0, 0};
 static swig_type_info _swigt__p_p_PyObject = {"_p_p_PyObject", "PyObject **", 0, 0, (void*)0, 0};
 static swig_type_info _swigt__p_size_type = {"_p_size_type", "size_type *", 0, 0, (void*)0, 0};
 static swig_type_info _swigt__p_std__allocatorT_double_t = {"_p_std__allocatorT_double_t", "std::vector< double >::allocator_type *|std::allocator< double > *", 0, 0, (void*)0, 0};
@@ -14544,6 +15026,8 @@ static swig_type_info *swig_type_initial[] = {
   &_swigt__p_allocator_type,
   &_swigt__p_char,
   &_swigt__p_difference_type,
+  &_swigt__p_double,
+  &_swigt__p_int,
   &_swigt__p_p_PyObject,
   &_swigt__p_size_type,
   &_swigt__p_std__allocatorT_double_t,
@@ -14566,6 +15050,8 @@ static swig_cast_info _swigc__p_LSA_Result[] = {  {&_swigt__p_LSA_Result, 0, 0,
 static swig_cast_info _swigc__p_allocator_type[] = {  {&_swigt__p_allocator_type, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_char[] = {  {&_swigt__p_char, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_difference_type[] = {  {&_swigt__p_difference_type, 0, 0, 0},{0, 0, 0, 0}};
+static swig_cast_info _swigc__p_double[] = {  {&_swigt__p_double, 0, 0, 0},{0, 0, 0, 0}};
+static swig_cast_info _swigc__p_int[] = {  {&_swigt__p_int, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_p_PyObject[] = {  {&_swigt__p_p_PyObject, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_size_type[] = {  {&_swigt__p_size_type, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_std__allocatorT_double_t[] = {  {&_swigt__p_std__allocatorT_double_t, 0, 0, 0},{0, 0, 0, 0}};
@@ -14588,6 +15074,8 @@ static swig_cast_info *swig_cast_initial[] = {
   _swigc__p_allocator_type,
   _swigc__p_char,
   _swigc__p_difference_type,
+  _swigc__p_double,
+  _swigc__p_int,
   _swigc__p_p_PyObject,
   _swigc__p_size_type,
   _swigc__p_std__allocatorT_double_t,
@@ -15340,6 +15828,9 @@ SWIG_init(void) {
   // thread safe initialization
   swig::container_owner_attribute();
   
+  
+  /* Initialize threading */
+  SWIG_PYTHON_INITIALIZE_THREADS;
 #if PY_VERSION_HEX >= 0x03000000
   return m;
 #else
@@ -87,12 +87,17 @@ def main():
   parser.add_argument("-m", "--minOccur", dest="minOccur", default=50, type=int, 
       help="specify the minimum occurence percentile of all times, default: 50,\n")
   parser.add_argument("-p", "--pvalueMethod", dest="pvalueMethod", default="perm", \
-      choices=["perm", "theo", "mix"],
+      choices=["perm", "theo", "mix", "tail"],
       help="specify the method for p-value estimation, \n \
             default: pvalueMethod=perm, i.e. use  permutation \n \
             theo: theoretical approximaton; if used also set -a value. \n \
             mix: use theoretical approximation for pre-screening \
-            if promising (<0.05) then use permutation. ")
+            if promising (<0.05) then use permutation; all pairs are \
+            screened first, then permuted as one stage, over -w workers \
+            or else in this process, where --threads only speeds up LS scores. \n \
+            tail: permutation, with p-values of few exceedances \
+            extrapolated by a generalized Pareto tail of the null, \
+            the Pfit column flags 1 fitted, 0 empirical, -1 no fit. ")
   parser.add_argument("-x", "--precision", dest="precision", default=arg_precision_default, type=int,\
       help="permutation/precision, specify the permutation \n \
             number or precision=1/permutation for p-value estimation. \n \
@@ -161,7 +166,31 @@ def main():
             and -T values, see FAQ and Xia et al. 2013 in reference")
   parser.add_argument("-v", "--progressive", dest="progressive", default=0, type=int, 
       help="specify the number of progressive output to save memory, default: 0,\n \
-            2G memory is required for 1M pairwise comparison. ")
+            about 200M memory is required for 1M pairwise comparison. Rows are spilled \n \
+            to a temporary file and get their q-values in a second pass. ")
+  parser.add_argument("-w", "--workers", dest="workers", default=1, type=int,
+      help="specify the number of worker processes sharing the pairwise \n \
+            calculations, default: 1, results are identical to a serial run")
+  parser.add_argument("--threads", dest="threads", default=1, type=int,
+      help="specify the number of native threads computing LS scores \n \
+            and bootstraps without -w, 0 for all cores, default: 1")
+  parser.add_argument("--seed", dest="seed", default=None, type=int,
+      help="specify the random seed of permutations and bootstraps, \n \
+            each pair gets its own stream from it, default: random")
+  parser.add_argument("--stopExceed", dest="stopExceed", default=0, type=int,
+      help="specify h to stop the permutations of a pair once h null scores \n \
+            reached its LS score (Besag-Clifford), -x is then the maximum \n \
+            number of permutations and the Perms column reports the number \n \
+            used, default: 0, always run -x permutations")
+  parser.add_argument("--shareNull", dest="shareNull", default=False, action="store_true",
+      help="with -n percentile, percentileZ, robustZ or pnz and no -T, \n \
+            compute the permutation null once for all pairs of series \n \
+            with the same length and zero/NA counts whose nonzero values \n \
+            have no ties, other pairs are permuted as usual; it saves time \n \
+            only if many factors share counts, default: off")
+  parser.add_argument("--dense", dest="dense", default=False, action="store_true",
+      help="summarize and normalize on dense arrays with nans as missing values \n \
+            instead of masked arrays, same results but faster, default: off")
   arg_namespace = parser.parse_args()
   
   delayLimit = vars(arg_namespace)['delayLimit']
@@ -181,6 +210,12 @@ def main():
   approxVar = vars(arg_namespace)['approxVar'] 
   trendThresh = vars(arg_namespace)['trendThresh'] 
   progressive = vars(arg_namespace)['progressive'] 
+  workers = vars(arg_namespace)['workers']
+  threads = vars(arg_namespace)['threads']
+  seed = vars(arg_namespace)['seed']
+  stopExceed = vars(arg_namespace)['stopExceed']
+  shareNull = vars(arg_namespace)['shareNull']
+  dense = vars(arg_namespace)['dense']
 
   try:
     extraFile_name = extraFile.name 
@@ -225,7 +260,14 @@ def main():
   else:
     zNormalize = lsalib.percentileZNormalize # fallback to default
 
+  if dense:
+    fTransform = lsalib.denseFunctions[fTransform]
+    zNormalize = lsalib.denseFunctions[zNormalize]
+
   assert precision>0, "precision %s is not positive" % str(precision) 
+  assert workers>0, "workers %s is not positive" % str(workers)
+  assert threads>=0, "threads %s is negative" % str(threads)
+  assert stopExceed>=0, "stopExceed %s is negative" % str(stopExceed)
   
   print("\t".join(['delayLimit','minOccur','fillMethod','pvalueMethod',\
       'precision','dataFile','extraFile','resultFile','repNum','spotNum',\
@@ -346,7 +388,8 @@ or use -e to specify another input file""", file=sys.stderr)
       pvalueMethod=pvalueMethod, precisionP=precision, fTransform=fTransform,\
       zNormalize=zNormalize, approxVar=approxVar, resultFile=resultFile,\
       firstFactorLabels=firstFactorLabels, trendThresh=trendThresh,\
-      secondFactorLabels=secondFactorLabels, qvalueMethod=qvalueMethod, progressive=progressive)
+      secondFactorLabels=secondFactorLabels, qvalueMethod=qvalueMethod, progressive=progressive,\
+      threads=threads, workers=workers, seed=seed, stopExceed=stopExceed, shareNull=shareNull)
 
   #print >>sys.stderr, "writing results ..."
   #col_labels= ['X','Y','LS','lowCI','upCI','Xs','Ys','Len','Delay','P','PCC','Ppcc','SPCC','Pspcc','SCC','Pscc','SSCC','Psscc',
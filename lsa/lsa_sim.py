@@ -177,11 +177,10 @@ def main():
     xSeriesData = xSeries.reshape(1,timespots)
     ySeriesData = ySeries.reshape(1,timespots) 
 
-    lsa_result = lsalib.singleLSA(xSeriesData, ySeriesData, delayLimit, \
-          lsalib.simpleAverage, zNormalize, trendThresh, keepTrace=True)
-    Al_tmp = len(lsa_result.trace)
+    (lsa_score, Xs_tmp, Ys_tmp, Al_tmp) = lsalib.singleLSA(xSeriesData, ySeriesData, \
+          delayLimit, lsalib.simpleAverage, zNormalize, trendThresh)
     if Al_tmp >= 1:
-      (Xs[j], Ys[j]) = (lsa_result.trace[Al_tmp-1][0], lsa_result.trace[Al_tmp-1][1])
+      (Xs[j], Ys[j]) = (Xs_tmp, Ys_tmp)
     else:
       (Xs[j], Ys[j]) = (-1, -1)
       #print >>sys.stderr, "impossible to align:"
@@ -200,15 +199,15 @@ def main():
     #    lsalib.ji_calc_trend(zNormalize(lsalib.simpleAverage(ySeriesData)),\
     #              timespots, trendThresh)
     #print "length=", Al_tmp
-    #print "R=", lsa_result.score*lengthSeries
+    #print "R=", lsa_score*lengthSeries
     #print [ (lsa_result.trace[i][0], lsa_result.trace[i][1]) for i in range(0,Al_tmp) ]
       
     D[j]=Xs[j]-Ys[j]
-    LS_values[j] = lengthSeries * np.abs(lsa_result.score)
+    LS_values[j] = lengthSeries * np.abs(lsa_score)
     P_perm[j] = lsalib.permuPvalue(xSeriesData, ySeriesData, delayLimit, \
-          int(1/perm_precision), np.abs(lsa_result.score), \
+          int(1/perm_precision), np.abs(lsa_score), \
           lsalib.simpleAverage, zNormalize, trendThresh)
-    P_theo[j] = lsalib.readPvalue(P_table, R=lengthSeries * np.abs(lsa_result.score),\
+    P_theo[j] = lsalib.readPvalue(P_table, R=lengthSeries * np.abs(lsa_score),\
         N=lengthSeries, \
         x_sd=np.sqrt(approxVar), M=1., alpha=1., beta=1., x_decimal=my_decimal)
     Al[j]=Al_tmp
@@ -43,13 +43,15 @@
 #Considering using R for simple numerics, rpy or use swig+R?
 
 #import public resources
-import csv, sys, os, random, tempfile, time
+import csv, sys, os, random, tempfile, time, multiprocessing
+from multiprocessing import shared_memory
 import numpy as np
 import numpy.testing
 #import numpy.ma as np.ma
 import scipy as sp
 import scipy.interpolate
 import scipy.stats
+import scipy.special
 import scipy.linalg
 #Import R through Rpy2
 rpy_import = False
@@ -97,11 +99,31 @@ disp_decimal=8
 kcut_min=100
 Rmax_min=10
 Rmax_max=50
+ptable_chunk=500      # x values per vectorized block of theoPvalue
+ptable_version=1      # bump when theoPvalue tables change, old cached tables are then ignored
+#cached theoPvalue tables, ELSA_PTABLE_CACHE overrides and an empty value disables it
+ptable_cache = os.environ.get('ELSA_PTABLE_CACHE', os.path.join( \
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), \
+    'elsa', 'ptables'))
 my_decimal = 2        # preset x step size for P_table
 pipi = np.pi**2       # pi^2
 pipi_inv = 1/pipi
 Q_lam_step = 0.05
 Q_lam_max = 0.95
+tail_exceed = 10      # exceedances below which -p tail fits the null's tail
+tail_max = 250        # largest tail fitted by -p tail
+tail_alpha = 0.05     # goodness of fit level of the tail
+corr_block = 256      # first factors per matrix product of PCC/SCC
+pair_tiles = 4        # tiles per worker in each corr_block of pairs
+promising_p = 0.05    # theoretical P-value up to which -p mix permutes, by convention
+#result table columns that are not float64, X and Y hold factor indices, Xi and Yi are not stored
+result_dtypes = { 'X': 'int32', 'Y': 'int32', 'Xs': 'int32', 'Ys': 'int32', 'Len': 'int32', \
+    'Delay': 'int16', 'Dspcc': 'int16', 'Dsscc': 'int16', 'Perms': 'int32', 'Pfit': 'int8' }
+d_nan = np.iinfo('int16').min   # Dspcc and Dsscc of pairs without shifted correlations
+q_columns = [ ('LS', 'P', 'Q'), ('PCC', 'Ppcc', 'Qpcc'), ('SPCC', 'Pspcc', 'Qspcc'), \
+    ('SCC', 'Pscc', 'Qscc'), ('SSCC', 'Psscc', 'Qsscc') ]   # q-values of P-value columns
+null_cache_max = 1000  # shared permutation nulls kept by sharedNull
+write_chunk = 10000   # result rows formatted and written at once
 
 ###############################
 # applyAnalsys
@@ -175,6 +197,8 @@ def calc_shift_corr(Xz, Yz, D, corfunc=calc_pearsonr):
     #print "Xz=", X_seg.shape
     #print "Yz=", Y_seg.shape
     assert len(X_seg) == len(Y_seg)
+    (X_seg, Y_seg) = (np.ma.array(X_seg, copy=True), np.ma.array(Y_seg, copy=True))
+    #segments are views, keep their masks from leaking into Xz, Yz and the next delays
     mask = np.logical_or(X_seg.mask, Y_seg.mask)
     X_seg.mask = mask
     Y_seg.mask = mask
@@ -185,8 +209,149 @@ def calc_shift_corr(Xz, Yz, D, corfunc=calc_pearsonr):
       p_max = cor[1]
   return (r_max, p_max, d_max)
         
+def corr_rows(A, rank=False):
+  """ rows of A centered and scaled to unit norm, so that the dot product
+      of two rows is their Pearson (rank=True: Spearman) correlation
+
+    Args:
+      A(np.array): factor_num x timespot_num, no nan
+      rank(bool): rank each row first, ties averaged
+
+    Return:
+      factor_num x timespot_num array, rows of constant series are nan
+  """
+  A = np.array(A, dtype='float', order='C')
+  if rank:
+    A = scipy.stats.rankdata(A, axis=1)
+  constant = np.all(A == A[:, :1], axis=1)
+  #einsum sums each C-ordered row alike however many rows A has, np.sum does not
+  A = A - (np.einsum('ik->i', A)/A.shape[1])[:, np.newaxis]
+  with np.errstate(invalid='ignore', divide='ignore'):
+    A = A / np.sqrt(np.einsum('ik,ik->i', A, A))[:, np.newaxis]
+  A[constant] = np.nan
+  return A
+
+def corr_pvalue(R, n, method='pearson'):
+  """ two tailed p-values of correlations R over n spots, the same
+      null distributions scipy.stats.pearsonr and spearmanr use
+  """
+  R = np.asarray(R, dtype='float')
+  with np.errstate(invalid='ignore', divide='ignore'):
+    if method == 'spearman':
+      T = R * np.sqrt((float(n-2)/((R+1.)*(1.-R))).clip(0))
+      return 2*scipy.special.stdtr(n-2, -np.abs(T))
+    else:
+      ab = n/2. - 1
+      return np.clip(2*scipy.special.betainc(ab, ab, (1.-np.abs(R))/2.), 0., 1.)
+
+def calc_corr_block(X, Y, method='pearson'):
+  """ correlations and two tailed p-values between all rows of X and Y, no masked values """
+  spotNum = X.shape[1]
+  #einsum sums every pair's products in spot order, unlike BLAS, so a pair gets
+  #the same bits whichever side and block its series are in, and R is symmetric
+  R = np.clip(np.einsum('ik,jk->ij', corr_rows(X, method == 'spearman'), \
+      corr_rows(Y, method == 'spearman')), -1., 1.)
+  return (R, corr_pvalue(R, spotNum, method))
+
+def calc_corr_matrix(firstAverage, secondAverage, method='pearson', wanted=None):
+  """ correlations of all factor pairs by matrix products
+
+    Args:
+      firstAverage(np.ma.array): factor_num x timespot_num averaged series, see ma_average_factors
+      secondAverage(np.ma.array): second factors, same timespot_num
+      method(str): 'pearson' or 'spearman'
+      wanted(np.array): bool first_num x second_num matrix of the needed pairs, all if None
+
+    Return:
+      (R, P), first_num x second_num arrays of correlations and two tailed p-values,
+      each pair taken on the spots unmasked in both series as calc_pearsonr does
+  """
+  corfunc = calc_spearmanr if method == 'spearman' else calc_pearsonr
+  firstData = np.ma.getdata(firstAverage)
+  secondData = np.ma.getdata(secondAverage)
+  firstObserved = np.logical_not(np.ma.getmaskarray(firstAverage))
+  secondObserved = np.logical_not(np.ma.getmaskarray(secondAverage))
+  firstComplete = np.all(firstObserved, axis=1)
+  secondComplete = np.all(secondObserved, axis=1)
+  if wanted is None:
+    wanted = np.ones((firstData.shape[0], secondData.shape[0]), dtype='bool')
+  R = np.empty(wanted.shape, dtype='float')
+  R.fill(np.nan)
+  P = R.copy()
+  todo = wanted.copy()
+
+  #complete series against complete series, one product
+  block = np.ix_(firstComplete, secondComplete)
+  if np.any(todo[block]) and firstData.shape[1] > 2:
+    (R[block], P[block]) = calc_corr_block(firstData[firstComplete], \
+        secondData[secondComplete], method)
+    todo[block] = False
+
+  #a series with masked spots against all series observed on its unmasked spots
+  for i in np.nonzero(np.logical_not(firstComplete))[0]:
+    spots = firstObserved[i]
+    rows = np.logical_and(todo[i], np.all(secondObserved[:, spots], axis=1))
+    if np.any(rows) and np.sum(spots) > 2:
+      (R[i, rows], P[i, rows]) = [ v[0] for v in calc_corr_block( \
+          firstData[i:i+1, spots], secondData[rows][:, spots], method) ]
+      todo[i, rows] = False
+  for j in np.nonzero(np.logical_not(secondComplete))[0]:
+    spots = secondObserved[j]
+    rows = np.logical_and(todo[:, j], np.all(firstObserved[:, spots], axis=1))
+    if np.any(rows) and np.sum(spots) > 2:
+      (R[rows, j], P[rows, j]) = [ v[:, 0] for v in calc_corr_block( \
+          firstData[rows][:, spots], secondData[j:j+1, spots], method) ]
+      todo[rows, j] = False
+
+  #pairs masked on different spots, or too short, one by one
+  for (i, j) in zip(*np.nonzero(todo)):
+    spots = np.logical_and(firstObserved[i], secondObserved[j])
+    if np.sum(spots) > 2:
+      (R[i, j], P[i, j]) = [ v[0, 0] for v in calc_corr_block( \
+          firstData[i:i+1, spots], secondData[j:j+1, spots], method) ]
+    else:
+      try:
+        (R[i, j], P[i, j]) = corfunc(np.ma.array(firstAverage[i], copy=True), \
+            np.ma.array(secondAverage[j], copy=True))
+      except FloatingPointError:
+        (R[i, j], P[i, j]) = (np.nan, np.nan)  #only this pair has no correlation
+  return (R, P)
+
+def calc_shift_corr_matrix(firstAverage, secondAverage, D, method='pearson', wanted=None):
+  """ calc_shift_corr of all factor pairs, one calc_corr_matrix per delay
+
+    Args:
+      firstAverage(np.ma.array): factor_num x timespot_num averaged series, see ma_average_factors
+      secondAverage(np.ma.array): second factors, same timespot_num
+      D(int): maximum delay
+      method(str): 'pearson' or 'spearman'
+      wanted(np.array): bool first_num x second_num matrix of the needed pairs, all if None
+
+    Return:
+      (r_max, p_max, d_max), first_num x second_num arrays of the correlation with
+      the largest absolute value over delays -D..D, its p-value and its delay
+  """
+  spotNum = firstAverage.shape[1]
+  shape = (firstAverage.shape[0], secondAverage.shape[0])
+  r_max = np.zeros(shape, dtype='float')
+  p_max = np.ones(shape, dtype='float')
+  d_max = np.zeros(shape, dtype='int')
+  for d in range(-D, D+1):
+    # i = Xs-Ys
+    if d < 0:
+      (X_seg, Y_seg) = (firstAverage[:, :(spotNum+d)], secondAverage[:, -d:spotNum])
+    else:
+      (X_seg, Y_seg) = (firstAverage[:, d:spotNum], secondAverage[:, :spotNum-d])
+    (R, P) = calc_corr_matrix(X_seg, Y_seg, method, wanted)
+    with np.errstate(invalid='ignore'):
+      better = np.abs(R) >= np.abs(r_max)   #later delays win ties, nan never does
+    r_max[better] = R[better]
+    p_max[better] = P[better]
+    d_max[better] = d
+  return (r_max, p_max, d_max)
+
 def singleLSA(series1, series2, delayLimit, fTransform, zNormalize, \
-    trendThresh=None, keepTrace=True):
+    trendThresh=None):
   """	do local simularity alignment 
 		
 		Args:
@@ -196,7 +361,8 @@ def singleLSA(series1, series2, delayLimit, fTransform, zNormalize, \
 			fTransform(func):	replicate summarizing function
 
 		Return:
-			one single LSA result
+			one single LSA result as (score, X start, Y start, alignment length),
+      starts are 1-based and (0, 0, 0) if nothing is aligned
       new implemented similarity alignment using external C++ routine in compcore
     
   """
@@ -207,29 +373,91 @@ def singleLSA(series1, series2, delayLimit, fTransform, zNormalize, \
   #print "f2=", isinstance(fTransform(series2),np.ma.core.MaskedArray)
   #try:
 
-  timespots = series1.shape[1] #time points in original data, not in trend data
-  if trendThresh != None:
-    xSeries = ji_calc_trend(\
-        zNormalize(fTransform(series1)), timespots, trendThresh )
-    ySeries = ji_calc_trend(\
-        zNormalize(fTransform(series2)), timespots, trendThresh )
-  else:
-    xSeries = zNormalize(fTransform(series1))
-    ySeries = zNormalize(fTransform(series2))
+  xSeries = normalizeSeries(series1, fTransform, zNormalize, trendThresh)
+  ySeries = normalizeSeries(series2, fTransform, zNormalize, trendThresh)
 
   #print "x=", xSeries
   #print "y=", ySeries
-  lsad=compcore.LSA_Data(delayLimit, xSeries, ySeries)
-  #except NotImplementedError:
-  #  print series1, series1.mask, series2, series2.mask
-  #  print fTransform, fTransform(series1), fTransform(series1).mask, fTransform(series2), fTransform(series2).mask
-  #  print zNormalize, zNormalize(fTransform(series1)), zNormalize(fTransform(series1)).mask, zNormalize(fTransform(series2)), zNormalize(fTransform(series2)).mask
-  #  quit()
-  #print "can get here lsad"
-  lsar=compcore.DP_lsa(lsad, keepTrace)
-  #print "can get here lsar"
-  del lsad
-  return lsar
+  #buffers are read in place by compcore, no copies into LSA_Data
+  (score, Xs, Ys, Al) = compcore.DP_lsa_buf(np.ascontiguousarray(xSeries, dtype='float'), \
+      np.ascontiguousarray(ySeries, dtype='float'), delayLimit)
+  return (score, Xs, Ys, Al)
+
+def normalizeSeries(series, fTransform, zNormalize, trendThresh=None):
+  """ summarize replicates, normalize and, if trendThresh, convert to trend series
+
+    Args:
+      series(np.ma.array):  replicate_num x timespot_num data of one factor
+      fTransform(func): replicate summarizing function
+      zNormalize(func): normalizing function for ftransformed data
+      trendThresh(float): threshold of trend series, None for no trend conversion
+
+    Return:
+      the normalized series as fed to compcore, timespot_num-1 long for trends
+  """
+
+  timespots = series.shape[1] #time points in original data, not in trend data
+  if trendThresh != None:
+    return ji_calc_trend(zNormalize(fTransform(series)), timespots, trendThresh)
+  return zNormalize(fTransform(series))
+
+def normalizeFactors(data, fTransform, zNormalize, trendThresh=None, minOccur=0.):
+  """ normalize every factor once, instead of once per pair
+
+    Args:
+      data(np.array): factor_num x replicate_num x timespot_num data, possibly nans
+      fTransform(func): replicate summarizing function
+      zNormalize(func): normalizing function for ftransformed data
+      trendThresh(float): threshold of trend series, None for no trend conversion
+      minOccur(float):  minimum portion of non-nan time spots for a factor to be used
+
+    Return:
+      (factorMatrix, usable): factor_num x series_length matrix of normalized series
+      and a boolean array marking factors that are not all nan and occur often enough;
+      rows of factors that are not usable are left as zeros
+  """
+
+  factorNum = data.shape[0]
+  timespots = data.shape[2]
+  lengthSeries = timespots if trendThresh == None else timespots-1
+  factorMatrix = np.zeros((factorNum, lengthSeries), dtype='float')
+  usable = np.zeros(factorNum, dtype='bool')
+  for i in range(0, factorNum):
+    Xz = np.ma.masked_invalid(data[i], copy=True)
+    Xz_badOccur = np.sum(np.logical_not(np.isnan(ma_average(Xz)), \
+        ma_average(Xz)==0))/float(timespots) < minOccur
+    if np.all(Xz.mask) or Xz_badOccur:
+      continue
+    usable[i] = True
+    factorMatrix[i] = normalizeSeries(Xz, fTransform, zNormalize, trendThresh)
+  return (factorMatrix, usable)
+
+def batchLSA(firstMatrix, secondMatrix, pairs, delayLimit, threads=0):
+  """ do local similarity alignment for many pairs of normalized series at once
+
+    Args:
+      firstMatrix(np.array):  factor_num x spot_num matrix of normalized X series
+      secondMatrix(np.array): factor_num x spot_num matrix of normalized Y series
+      pairs(np.array):  pair_num x 2 row indices, (row in firstMatrix, row in secondMatrix)
+      delayLimit(int):  maximum time unit of delayed response allowed
+      threads(int): number of native threads in compcore, 0 to use all cores
+
+    Return:
+      (scores, aligns): LS scores and pair_num x 3 (X start, Y start, alignment length)
+      as from singleLSA; compcore runs the pairs without holding the GIL
+  """
+
+  firstMatrix = np.ascontiguousarray(firstMatrix, dtype='float')
+  secondMatrix = np.ascontiguousarray(secondMatrix, dtype='float')
+  assert firstMatrix.shape[1] == secondMatrix.shape[1]
+  pairs = np.ascontiguousarray(pairs, dtype=np.int32).reshape(-1, 2)
+  scores = np.zeros(pairs.shape[0], dtype='float')
+  aligns = np.zeros((pairs.shape[0], 3), dtype=np.int32)
+  if len(pairs) == 0:
+    return (scores, aligns)
+  compcore.DP_lsa_batch(firstMatrix, secondMatrix, firstMatrix.shape[1], pairs, \
+      delayLimit, threads, scores, aligns)
+  return (scores, aligns)
 	
 def sample_wr(population, k):
   """ Chooses k random elements (with replacement) from a population
@@ -265,8 +493,54 @@ def ma_average(ts, axis=0):
     ns.mask = [ns.mask] * ns.shape[axis]
   return ns
 
+def nan_series(tseries):
+  """ dense float copy of a (masked) series, nan where masked or not finite """
+  ns = np.ma.filled(np.ma.asarray(tseries, dtype='float'), np.nan)
+  return np.where(np.isfinite(ns), ns, np.nan)
+
+def nan_average(ts, axis=0):
+  """ mean ignoring nans, summing as np.ma.mean does, nan where all are nan """
+  ok = ~np.isnan(ts)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    return (np.sum(np.where(ok, ts, 0.), axis=axis)/np.sum(ok, axis=axis))[()]
+
+def nan_std(ts, axis=None, ddof=0):
+  """ standard deviation ignoring nans as np.ma.std, nan where at most ddof are not nan """
+  ok = ~np.isnan(ts)
+  cnt = np.sum(ok, axis=axis) - ddof
+  with np.errstate(invalid='ignore', divide='ignore'):
+    mean = np.sum(np.where(ok, ts, 0.), axis=axis, keepdims=True) \
+        /np.sum(ok, axis=axis, keepdims=True)
+    danom = np.where(ok, ts - mean, 0.)
+    return np.where(cnt > 0, np.sqrt(np.sum(danom*danom, axis=axis)/cnt), np.nan)[()]
+
+def nan_median(ts, axis=0):
+  """ median ignoring nans, taking the middle values as np.ma.median does,
+      nan where all are nan
+  """
+  sts = np.sort(ts, axis=axis)  #nans sorted last
+  cnt = np.sum(~np.isnan(ts), axis=axis, keepdims=True)
+  h = np.minimum(cnt//2, ts.shape[axis]-1)
+  l = np.maximum(np.where(cnt%2 == 1, h, h-1), 0)
+  low_high = np.concatenate([np.take_along_axis(sts, l, axis=axis), \
+      np.take_along_axis(sts, h, axis=axis)], axis=axis)
+  return np.where(np.squeeze(cnt, axis=axis) > 0, np.sum(low_high, axis=axis)/2., np.nan)[()]
+
+def nan_divide(a, b):
+  """ a/b with nan where np.ma division would mask, i.e. b is about 0 """
+  with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+    return np.where(np.abs(a)*np.finfo('float').tiny >= np.abs(b), np.nan, a/b)
+
+def ma_average_factors(data):
+  """ ma_average of every factor of a factor_num x replicate_num x timespot_num array,
+      masked where all replicates are nan
+  """
+  ns = np.ma.mean(np.ma.masked_invalid(data), axis=1)
+  ns.mask = np.ma.getmaskarray(ns)
+  return ns
+
 def bootstrapCI(series1, series2, Smax, delayLimit, bootCI, bootNum, \
-    fTransform, zNormalize, trendThresh=None, debug=0):
+    fTransform, zNormalize, trendThresh=None, debug=0, rng=None, threads=1):
   """	do bootstrap CI estimation
 
 		Args:
@@ -276,10 +550,17 @@ def bootstrapCI(series1, series2, Smax, delayLimit, bootCI, bootNum, \
       bootCI(float):  confidence interval size
       bootNum(int): number of bootstraps
 			fTransform(func):	replicate summarizing function
+      rng(np.random.Generator): random stream of the resampling, random if None
+      threads(int): compcore threads scoring the bootstraps
 
     Return:
       Confidence Interval
 
+    Note:
+      all bootNum x replicates x timespots resamples are drawn, summarized and
+      normalized at once by the dense counterparts in denseFunctions, other
+      functions normalize one resample at a time
+
 	"""
 
   ### no feasible, skipping bootstraping
@@ -293,29 +574,30 @@ def bootstrapCI(series1, series2, Smax, delayLimit, bootCI, bootNum, \
     lengthSeries = timespots - 1
 
   ###print "------Bootstrapping------"
-  lsad = compcore.LSA_Data()
-  BS_set = np.zeros(bootNum, dtype='float')
-  for i in range(0, bootNum):
-    if trendThresh == None:
-      Xb = zNormalize(fTransform(np.ma.array(\
-          [ sample_wr(series1[:,j], series1.shape[0]) \
-            for j in range(0,series1.shape[1]) ]).T))
-      Yb = zNormalize(fTransform(np.ma.array(\
-          [ sample_wr(series2[:,j], series2.shape[0]) \
-            for j in range(0,series2.shape[1]) ]).T))
-    else:
-      Xb = ji_calc_trend( zNormalize(fTransform(np.ma.array(\
-          [ sample_wr(series1[:,j], series1.shape[0]) \
-            for j in range(0,series1.shape[1]) ]).T)), \
-            timespots, trendThresh )
-      Yb = ji_calc_trend( zNormalize(fTransform(np.ma.array(\
-          [ sample_wr(series2[:,j], series2.shape[0]) \
-            for j in range(0,series2.shape[1]) ]).T)), \
-            timespots, trendThresh )
-    #print "Xb=", Xb
-    #print "Yb=", Yb
-    lsad.assign( delayLimit, Xb, Yb )
-    BS_set[i] = compcore.DP_lsa(lsad, False).score
+  if rng is None:
+    rng = np.random.default_rng(random.getrandbits(64))
+  #replicates of every bootstrap and time spot drawn at once, nans stay masked
+  replicates = series1.shape[0]
+  spots = np.arange(0, timespots)
+  draws = rng.integers(0, replicates, size=(2, bootNum, replicates, timespots))
+  Xbs = nan_series(series1)[draws[0], spots]
+  Ybs = nan_series(series2)[draws[1], spots]
+  if fTransform in denseFunctions:  #masked functions have dense counterparts
+    (fTransform, zNormalize) = (denseFunctions[fTransform], denseFunctions[zNormalize])
+  if fTransform in denseFunctions.values() and zNormalize in denseFunctions.values():
+    #all bootstraps summarized and normalized at once
+    (Xb, Yb) = (zNormalize(fTransform(Xbs)), zNormalize(fTransform(Ybs)))
+    if trendThresh != None:
+      (Xb, Yb) = (ji_calc_trends(Xb, trendThresh), ji_calc_trends(Yb, trendThresh))
+  else:
+    Xb = np.array([ normalizeSeries(np.ma.masked_invalid(Xbs[i]), fTransform, zNormalize, \
+        trendThresh) for i in range(0, bootNum) ], dtype='float').reshape(bootNum, lengthSeries)
+    Yb = np.array([ normalizeSeries(np.ma.masked_invalid(Ybs[i]), fTransform, zNormalize, \
+        trendThresh) for i in range(0, bootNum) ], dtype='float').reshape(bootNum, lengthSeries)
+  #print "Xb=", Xb
+  #print "Yb=", Yb
+  pairs = np.repeat(np.arange(0, bootNum), 2).reshape(bootNum, 2)
+  (BS_set, aligns) = batchLSA(Xb, Yb, pairs, delayLimit, threads) #score only, the alignments unused
   BS_set.sort()                                 #from smallest to largest
   BS_mean = np.mean(BS_set)
   #print np.histogram(BS_set, bins=10)
@@ -333,23 +615,60 @@ def bootstrapCI(series1, series2, Smax, delayLimit, bootCI, bootNum, \
     #print "z0=", z0, "a1=", a1, "a2=", a2
   return ( BS_mean, BS_set[int(np.floor(bootNum*a1))-1], BS_set[int(np.ceil(bootNum*a2))-1] )
 
-def readPvalue(P_table, R, N, x_sd=1., M=1., alpha=1., beta=1., x_decimal=my_decimal):
+def readPvalue(P_table, R, N, x_sd=1., M=1., alpha=1., beta=1., x_decimal=my_decimal, \
+    interpolate=False):
   # R=observed range, N=timepoints, x_sd=std.dev of single series, M=replicates, alpha=1-portion of zero in X, beta=1-portion of zero in Y
   # x' = R*M/(alpha*beta*sqrt(N)*sd) * 10^(x_decimal)
   # has to ceil the x value to avoid round to 0, which is not amenable to calculation
-  try:
-    xi = int(np.around(R*M/(x_sd*np.sqrt(alpha*beta*N))*(10**x_decimal)))    #
-  except OverflowError as ValueError:
-    #print alpha, beta
-    #print "x=", np.around(R*M/np.sqrt(alpha*beta*N)*(10**x_decimal))
-    #quit()
-    return np.nan
-  if xi in P_table:
-    return P_table[xi]
-  elif xi>max(P_table.keys()):
-    return 0.
+  # R can be an array of ranges, then an array of P-values is returned;
+  # interpolate reads linearly between the grid points instead of the nearest one
+  x = np.asarray(R*M/(x_sd*np.sqrt(alpha*beta*N))*(10**x_decimal), dtype='float')
+  xi = x if interpolate else np.around(x)
+  xmax = len(P_table) - 1
+  valid = np.isfinite(xi) & (xi >= 0)
+  inside = valid & (xi <= xmax)
+  P = np.full(x.shape, np.nan)
+  P[valid & (xi > xmax)] = 0.
+  if interpolate:
+    P[inside] = np.interp(xi[inside], np.arange(0, xmax+1), P_table)
   else:
-    return np.nan
+    P[inside] = np.asarray(P_table)[xi[inside].astype('int')]
+  return P if P.ndim else P[()]
+
+def ptableCacheFile(Rmax, Dmax, precision, x_decimal):
+  """ the cache file of a theoPvalue table, None if caching is disabled """
+  if not ptable_cache:
+    return None
+  return os.path.join(ptable_cache, 'v%d' % ptable_version, \
+      'R%d_D%d_P%r_X%d.npy' % (Rmax, Dmax, float(precision), x_decimal))
+
+def loadPtable(cacheFile):
+  """ memory map a cached P-table array, None if there is none or it is unreadable """
+  if cacheFile is None or not os.path.exists(cacheFile):
+    return None
+  try:
+    return np.load(cacheFile, mmap_mode='r')
+  except (OSError, ValueError):
+    return None
+
+def savePtable(cacheFile, P_array):
+  """ write a P-table array to the cache, atomically so concurrent runs never see
+      a partial file; an unwritable cache is only reported
+  """
+  if cacheFile is None:
+    return
+  try:
+    os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(cacheFile), \
+        suffix='.tmp', delete=False) as tempFile:
+      np.save(tempFile, P_array)
+    os.replace(tempFile.name, cacheFile)
+  except OSError as e:
+    print("can not cache p_table:", e, file=sys.stderr)
+    try:
+      os.remove(tempFile.name)
+    except (OSError, NameError):
+      pass
 
 def theoPvalue(Rmax, Dmax=0, precision=.001, x_decimal=my_decimal):   
   # let's produce 2 tail-ed p-value
@@ -362,45 +681,42 @@ def theoPvalue(Rmax, Dmax=0, precision=.001, x_decimal=my_decimal):
   # x_decimal is for augment x_index
   Rmax = np.max((Rmax, Rmax_min))
   Rmax = np.min((Rmax, Rmax_max)) #avoid extreme time consuming for long series
+  cacheFile = ptableCacheFile(Rmax, Dmax, precision, x_decimal)
+  P_array = loadPtable(cacheFile)
+  if P_array is not None:
+    print("reading p_table from", cacheFile, file=sys.stderr)
+    return P_array
   print("computing p_table with Rmax=", Rmax, file=sys.stderr)
-  P_table = dict()
-  for xi in range(0,Rmax*10**(x_decimal)+1): 
-    if xi == 0:
-      P_table[xi] = 1
-      continue
-    #if np.mod(xi,100) == 0:
-    #  print >>sys.stderr, "progress: %f " % (xi/float(Rmax*10**(x_decimal)))
-    x = xi/float(10**(x_decimal)) #standard x with variance corrected
-    xx = x**2
+  P_table = np.ones(Rmax*10**(x_decimal)+1, dtype='float')
+  alpha = precision
+  B = 2*Dmax+1
+  #all x of a chunk against k=1..Kcut at once, each x truncated at its own Kcut
+  for start in range(1, Rmax*10**(x_decimal)+1, ptable_chunk):
+    xis = np.arange(start, min(start+ptable_chunk, Rmax*10**(x_decimal)+1))
+    x = xis/float(10**(x_decimal)) #standard x with variance corrected
+    xx = np.float_power(x, 2)   #float_power rounds as the scalar x**2, not as x*x
     pipi_over_xx = pipi/xx
-    alpha = precision
-    B = 2*Dmax+1
-    #print pipi_over_xx
-    #print alpha
-    #print np.log(alpha*xx*(1-np.exp(-pipi_over_xx))/(8**B)/2)
-    #print np.log(alpha*xx*(1-np.exp(-pipi_over_xx))/(8**B)/2) / pipi_over_xx
-    Kcut = np.max((kcut_min, int(np.ceil(.5\
+    Kcut = np.maximum(kcut_min, np.ceil(.5\
       - np.log((alpha/(2**B-1))**(1/B)*xx*(1-np.exp(-pipi_over_xx))/8/2)\
-      /pipi_over_xx ))))
-    #Kcut = 200
+      /pipi_over_xx ).astype('int'))
     A = 1/xx
-    Rcdf = 0     # root of cdf
-    P_two_tail = 1.
-    for k in range(1,Kcut+1):
-      C = (2*k-1)**2
-      Rcdf = Rcdf + (A+pipi_inv/C)*np.exp(-C*pipi_over_xx/2)
-      P_current = 1 - (8**B)*(Rcdf**B)
-      if P_current<0:
-        break
-      else:
-        P_two_tail = P_current
+    C = ((2*np.arange(1, np.max(Kcut)+1)-1)**2).astype('float')
+    Rcdf = np.cumsum((A[:,np.newaxis]+pipi_inv/C)\
+      *np.exp(-C*pipi_over_xx[:,np.newaxis]/2), axis=1)   # root of cdf
+    P_current = 1 - (8**B)*np.float_power(Rcdf, B)
+    #stop at the first negative P_current or at Kcut, keep the last P_current before
+    stop = np.logical_or(P_current<0, np.arange(1, len(C)+1) > Kcut[:,np.newaxis])
+    last = np.where(np.any(stop, axis=1), np.argmax(stop, axis=1), len(C)) - 1
+    P_two_tail = np.where(last >= 0, P_current[np.arange(len(xis)), last], 1.)
     #P_two_tail >= 0 is already ensured above
-    P_table[xi] = P_two_tail
+    P_table[xis] = P_two_tail
 
+  savePtable(cacheFile, P_table)
   return P_table
 	
 def permuPvalue(series1, series2, delayLimit, precisionP, \
-    Smax, fTransform, zNormalize, trendThresh=None):
+    Smax, fTransform, zNormalize, trendThresh=None, seed=None, \
+    xSeries=None, ySeries=None, rng=None):
   """ do permutation Test
 
     Args:
@@ -410,42 +726,223 @@ def permuPvalue(series1, series2, delayLimit, precisionP, \
             pvalueMethod(int): number of permutations
             Smax(int): maximum LSA
 			fTransform(func):	replicate summarizing function
+            seed(int): seed of the compcore shuffles, drawn from rng if None
+            xSeries(np.array): normalized series1 if already known, e.g. from normalizeFactors
+            ySeries(np.array): normalized series2 if already known
+            rng(np.random.Generator): random stream of the permutations, np.random if None
 
     Return:
             p-value
 
+    Note:
+      with a rank based zNormalize and no trend conversion, a permutation of the 
+      normalized series equals the normalized permutation, so all permutations
+      are run inside compcore.DP_lsa_perm from the normalized series
 	"""
   
-  lengthSeries = series1.shape[1]
-  timespots = series1.shape[1]
-  if trendThresh != None:
-    lengthSeries = timespots - 1
+  PP_set = permuNull(series1, series2, delayLimit, precisionP, fTransform, \
+      zNormalize, trendThresh, seed, xSeries, ySeries, rng)
+  #PP_set[pvalueMethod]=Smax  #the original test shall not be considerred
+  #print "PP_set", PP_set, PP_set >= Smax, np.sum(PP_set>=Smax), float(pvalueMethod)
+  P_two_tail = np.sum(permuExceed(PP_set, Smax))/float(precisionP)
+  return P_two_tail
 
-  lsad = compcore.LSA_Data()
-  PP_set = np.zeros(precisionP, dtype='float')
-  if trendThresh == None:
-    Xz = zNormalize(fTransform(series1))
+def seqPermuPvalue(series1, series2, delayLimit, precisionP, stopExceed, \
+    Smax, fTransform, zNormalize, trendThresh=None, \
+    xSeries=None, ySeries=None, rng=None):
+  """ do permutation Test with Besag-Clifford sequential stopping
+
+    Args:
+      the same as permuPvalue, precisionP is the maximum number of permutations
+      stopExceed(int): stop once this many null scores reached Smax
+
+    Return:
+      (p-value, number of permutations used), h/l if the h-th exceedance came
+      at permutation l, otherwise exceedances/precisionP as permuPvalue
+  """
+
+  if xSeries is None:
+    xSeries = normalizeSeries(series1, fTransform, zNormalize, trendThresh)
+  if ySeries is None and trendThresh == None:
+    ySeries = normalizeSeries(series2, fTransform, zNormalize)
+  permNum = 0
+  exceedNum = 0
+  batchNum = stopExceed   #permutations between checks, doubled every batch
+  while permNum < precisionP:
+    batchNum = min(batchNum, precisionP-permNum)
+    exceeded = np.cumsum(permuExceed(permuNull(series1, series2, delayLimit, \
+        batchNum, fTransform, zNormalize, trendThresh, None, xSeries, \
+        ySeries, rng), Smax)) + exceedNum
+    if exceeded[-1] >= stopExceed:
+      permNum += int(np.searchsorted(exceeded, stopExceed)) + 1
+      return (stopExceed/float(permNum), permNum)
+    permNum += batchNum
+    exceedNum = exceeded[-1]
+    batchNum *= 2
+  return (exceedNum/float(precisionP), precisionP)
+
+def nullPatterns(data, fTransform, zNormalize):
+  """ the zero/NA pattern of every factor for sharedNull
+
+    Args:
+      data(np.array): factor_num x replicate_num x timespot_num data, possibly nans
+      fTransform(func): replicate summarizing function
+      zNormalize(func): rank based normalizing function
+
+    Return:
+      a list of (below zero, zero, NA) value counts of every summarized factor,
+      zeros counted as NAs for noZeroNormalize, which masks them; a single zero
+      ties with nothing and counts as any other value; None for factors with tied
+      nonzero values, their null is not shared
+  """
+
+  noZero = zNormalize in (noZeroNormalize, denseNoZeroNormalize)
+  patterns = []
+  for i in range(0, data.shape[0]):
+    Xf = nan_series(fTransform(np.ma.masked_invalid(data[i], copy=True)))
+    values = Xf[~np.isnan(Xf)]
+    zeroNum = np.sum(values == 0)
+    nonzero = values[values != 0]
+    if len(np.unique(nonzero)) != len(nonzero):
+      patterns.append(None)
+    elif noZero:
+      patterns.append((0, 0, len(Xf)-len(nonzero)))
+    elif zeroNum > 1:
+      patterns.append((int(np.sum(values < 0)), int(zeroNum), len(Xf)-len(values)))
+    else:
+      patterns.append((0, 0, len(Xf)-len(values)))
+  return patterns
+
+def sharedNull(xPattern, yPattern, lengthSeries, delayLimit, precisionP, zNormalize, \
+    seed, nullCache):
+  """ permutation null LS scores shared by all pairs of factors with the same
+      length and zero/NA patterns
+
+    Args:
+      xPattern(tuple): (below zero, zero, NA) counts of Seq X, see nullPatterns
+      yPattern(tuple): the counts of Seq Y
+      lengthSeries(int): length of the normalized series
+      delayLimit(int): maximum time unit of delayed response allowed
+      precisionP(int): number of permutations
+      zNormalize(func): rank based normalizing function, without trend conversion
+      seed(int): seed of the run, the null of every key has its own stream from it
+      nullCache(dict): the nulls computed so far, at most null_cache_max
+
+    Return:
+      precisionP null scores
+
+    Note:
+      after a rank based zNormalize a series whose nonzero values are tie-free is a
+      fixed set of quantiles, with the zero block at one value, given its length and
+      counts; so the null is computed once per such key, from a canonical Seq X in
+      an order drawn from the key's stream against shuffles of a canonical Seq Y, as
+      permuNull does for a single pair
+  """
+
+  key = (lengthSeries, delayLimit, precisionP) + sum(sorted([xPattern, yPattern]), ())
+  if key not in nullCache:
+    if len(nullCache) >= null_cache_max:
+      nullCache.pop(next(iter(nullCache)))  #drop the oldest null
+    stream = np.random.SeedSequence(seed, spawn_key=key)
+    (X, Y) = [ np.asarray(zNormalize(np.ma.masked_invalid(np.concatenate(( \
+        np.arange(-below, 0.), np.zeros(zero), \
+        np.arange(1., lengthSeries-below-zero-na+1), np.full(na, np.nan))))), \
+        dtype='float') for (below, zero, na) in (key[3:6], key[6:9]) ]
+    X = np.random.default_rng(stream).permutation(X)
+    nullCache[key] = np.zeros(precisionP, dtype='float')
+    compcore.DP_lsa_perm_buf(X, Y, delayLimit, int(stream.generate_state(1)[0] >> 1), \
+        nullCache[key])
+  return nullCache[key]
+
+def tailPvalue(PP_set, Smax):
+  """ permutation p-value, extrapolated by a generalized Pareto tail if small
+
+    Args:
+      PP_set(np.array): permutation null scores
+      Smax(float): the observed LS score, >= 0
+
+    Return:
+      (p-value, fit): fit is 0 for the empirical p-value of at least tail_exceed
+      exceedances, 1 for a GPD tail estimate, -1 if no tail fitted at tail_alpha,
+      or if the fitted tail is bounded (shape < 0) and Smax is at or past its
+      endpoint threshold-scale/shape, where it gives exactly 0; then the empirical
+      p-value, possibly 0, is kept
+
+    Note:
+      the tail of the largest k null scores, k from min(tail_max, N/4) down by 10, is
+      fitted over the threshold between the k-th and (k+1)-th score and accepted
+      once a Kolmogorov-Smirnov test does not reject it, p = k/N*(1-GPD(Smax-t)),
+      following Knijnenburg et al. 2009
+  """
+
+  null = np.sort(np.abs(PP_set))[::-1]
+  permNum = len(null)
+  exceedNum = np.sum(null >= Smax)
+  if exceedNum >= tail_exceed:
+    return (exceedNum/float(permNum), 0)
+  for tailNum in range(min(tail_max, permNum//4), tail_exceed, -10):
+    threshold = (null[tailNum-1] + null[tailNum])/2.
+    excess = null[:tailNum] - threshold
+    (shape, loc, scale) = scipy.stats.genpareto.fit(excess, floc=0)
+    if scipy.stats.kstest(excess, 'genpareto', args=(shape, 0, scale)).pvalue > tail_alpha:
+      if shape < 0 and Smax-threshold >= -scale/shape:
+        break   #beyond the end of a bounded tail, no estimate but 0
+      return (tailNum/float(permNum)*scipy.stats.genpareto.sf(Smax-threshold, \
+          shape, 0, scale), 1)
+  return (exceedNum/float(permNum), -1)
+
+def permuExceed(PP_set, Smax):
+  """ null scores at least as extreme as Smax, two tailed """
+  if Smax >= 0:
+    return np.abs(PP_set) >= Smax
   else:
-    Xz = ji_calc_trend(\
-        zNormalize(fTransform(series1)), timespots, trendThresh)
+    return -np.abs(PP_set) <= Smax
+
+def permuNull(series1, series2, delayLimit, precisionP, fTransform, zNormalize, \
+    trendThresh=None, seed=None, xSeries=None, ySeries=None, rng=None):
+  """ precisionP permutation null LS scores of series1 against shuffled series2,
+      arguments as permuPvalue
+  """
+
+  if xSeries is None:
+    xSeries = normalizeSeries(series1, fTransform, zNormalize, trendThresh)
+  Xz = xSeries
   Y = np.ma.array(series2)  #use = only assigns reference, must use a constructor
 
+  if trendThresh == None and zNormalize in rankNormalizers:
+    if seed == None and rng is None:
+      seed = np.random.randint(0, 2**31)
+    elif seed == None:
+      seed = int(rng.integers(0, 2**31))
+    if ySeries is None:
+      ySeries = normalizeSeries(Y, fTransform, zNormalize)
+    PP_set = np.zeros(precisionP, dtype='float')
+    compcore.DP_lsa_perm_buf(Xz, ySeries, delayLimit, seed, PP_set)
+  else:
+    PP_set = permuScores(Xz, Y, delayLimit, precisionP, \
+        fTransform, zNormalize, trendThresh, rng)
+  return PP_set
+
+def permuScores(Xz, Y, delayLimit, precisionP, \
+    fTransform, zNormalize, trendThresh=None, rng=None):
+  """ permutation null scores, shuffling and normalizing Y in python,
+      with the np.random.Generator rng if given
+  """
+
+  timespots = Y.shape[1]
+  PP_set = np.zeros(precisionP, dtype='float')
   for i in range(0, precisionP):
-    np.random.shuffle(Y.T)  #shuffle is in place
+    if rng is None:
+      np.random.shuffle(Y.T)  #shuffle is in place
+    else:
+      Y = Y[:, rng.permutation(timespots)]
     if trendThresh == None:
       Yz = zNormalize(fTransform(Y)) 
     else:
       Yz = ji_calc_trend(\
         zNormalize(fTransform(Y)), timespots, trendThresh)
-    lsad.assign( delayLimit, Xz, Yz)
-    PP_set[i] = compcore.DP_lsa(lsad, False).score
-  #PP_set[pvalueMethod]=Smax  #the original test shall not be considerred
-  #print "PP_set", PP_set, PP_set >= Smax, np.sum(PP_set>=Smax), float(pvalueMethod)
-  if Smax >= 0:
-    P_two_tail = np.sum(np.abs(PP_set) >= Smax)/float(precisionP)
-  else:
-    P_two_tail = np.sum(-np.abs(PP_set) <= Smax)/float(precisionP)
-  return P_two_tail
+    PP_set[i] = compcore.DP_lsa_score_buf(Xz, Yz, delayLimit)  #score only, no trace needed
+  return PP_set
 
 #Q_lam_step = 0.05
 #Q_lam_max = 0.95
@@ -475,7 +972,8 @@ def R_Qvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoother',
   #print "qvalues_return=", qvalues_return
   return qvalues_return
 
-def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoother', robust=False, smooth_df=3):
+def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoother', robust=False, smooth_df=3, \
+    rng=None):
   """ do Q-value calculation
 
     Args:
@@ -484,6 +982,7 @@ def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoothe
       method(str):  calculating method, currently only support 'smoother'
       robust(bool): use robust static or not, default not
       smooth_df(int): order of spline function
+      rng(np.random.Generator): random stream of the pi_0 bootstrap, random if None
 
     Returns:
       qvalues(np.array): a set of qvalues
@@ -492,8 +991,9 @@ def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoothe
   try:
     #assume pvalues is an array with possible nans
     #get a list of non nan pvalues, do the same procedure, putback to original list
-    mpvalues = np.ma.masked_invalid(pvalues,copy=True)
-    rpvalues = mpvalues[~mpvalues.mask]
+    pvalues = np.asarray(pvalues, dtype='float')
+    valid = np.isfinite(pvalues)
+    rpvalues = pvalues[valid]
     p_num = len(pvalues)
     rp_num = len(rpvalues)
     #rp_nnz = len(np.nonzero(rpvalues))
@@ -501,19 +1001,21 @@ def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoothe
 
     if rp_num <= 1:
       #print >>sys.stderr, "WARN: not enough number of pvalues for q-value evaluation! nan will be filled!"
-      return np.array( [np.nan] * p_num, dtype='float')
+      return np.full(p_num, np.nan)
 
     rp_max = np.max(rpvalues)
     rp_lam = lam[lam<rp_max]
 
     if len(rp_lam) <= 1:
-      return np.array( [np.nan if np.isnan(pvalues[i]) else 0 for i in range(0,p_num)],  dtype='float')
+      return np.where(np.isnan(pvalues), np.nan, 0.)
 
     #print "rpvalues=", rpvalues, rp_num, rp_lam
 
-    pi_set = np.zeros(len(rp_lam), dtype='float')
-    for i in range(0, len(rp_lam)): 
-      pi_set[i] = np.mean(rpvalues>=rp_lam[i])/(1-rp_lam[i])
+    rp_argsort = np.argsort(rpvalues)                     #ascending order
+    rp_sorted = rpvalues[rp_argsort]
+    #portion of p-values >= each lambda, counted from the sorted p-values
+    rp_rank_lam = np.searchsorted(rp_sorted, rp_lam, side='left')
+    pi_set = ((rp_num - rp_rank_lam)/rp_num)/(1-rp_lam)
 
     #print "p=",pvalues
     #print len(pi_set), rp_max, len(rp_lam) #rp_nnz
@@ -534,15 +1036,16 @@ def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoothe
 
     if method=='bootstrap':                            #bootstrap
       pi_min = np.min(pi_set)
-      mse = np.zeros((100, len(rp_lam)), dtype='float')
-      pi_set_boot = np.zeros((100, len(rp_lam)), dtype='float')
-      for j in range(0, 100):
-        p_boot = sample_wr(rpvalues, rp_num)
-        for i in range(0, len(rp_lam)):
-          pi_set_boot[j][i] = np.mean(p_boot>=rp_lam[i])/(1-rp_lam[i]) 
-        mse[j] = (pi_set_boot[j]-pi_min)**2
-      min_mse_j = np.argmin(mse)
-      pi_0 = np.min(pi_set_boot[min_mse_j])
+      #a bootstrap only changes how many p-values fall between the lambdas,
+      #so draw these counts of all 100 bootstraps at once
+      if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+      lam_bins = np.diff(np.concatenate(([0], rp_rank_lam, [rp_num])))
+      boot_bins = rng.multinomial(rp_num, lam_bins/float(rp_num), size=100)
+      boot_above = np.cumsum(boot_bins[:, :0:-1], axis=1)[:, ::-1]   #p-values >= each lambda
+      pi_set_boot = (boot_above/rp_num)/(1-rp_lam)
+      mse = np.sum((pi_set_boot-pi_min)**2, axis=0)
+      pi_0 = np.min(pi_set[mse == np.min(mse)])
       #print "pi_0=", pi_0
       pi_0 = np.max([np.min( [np.min(pi_0), 1]), ]) #0<=pi_0<=1
       #print "pi_0=", pi_0
@@ -552,9 +1055,7 @@ def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoothe
         #return np.array( [np.nan] * p_num, dtype='float' )
 
     #print "pi_0=", pi_0
-    rp_argsort = np.argsort(rpvalues)                     #np.nan will be sorted as maximum (the largest rank)
-    #print "argsort of rps=", rpvalues[rp_argsort]
-    rp_ranks = tied_rank(rpvalues)
+    rp_ranks = dense_tied_rank(rpvalues)
     #print "tied rank of rps=", rp_ranks
     #print "pi_0, p_ranks, pvalues, len(pvalues)", pi_0, p_ranks, pvalues, len(pvalues)
     if robust:
@@ -562,16 +1063,11 @@ def storeyQvalue(pvalues, lam=np.arange(0,Q_lam_max,Q_lam_step), method='smoothe
     else:
       rqvalues = pi_0*rp_num*rpvalues*(1/rp_ranks) 
     #print "rqs=", rqvalues
-    rqvalues[rp_argsort[rp_num-1]] = np.min( [rqvalues[rp_argsort[rp_num-1]], 1] ) # argsort in asscending order
-    for i in reversed(list(range(0,rp_num-1))): #don't know why it is so complicated here, why not just use qvalues; to enssure desencing order!!!
-      rqvalues[rp_argsort[i]] = np.min( [rqvalues[rp_argsort[i]], rqvalues[rp_argsort[i+1]], 1] )
-
-    qvalues=np.array([np.nan]*p_num)
-    j=0
-    for i in range(0, p_num):
-      if not mpvalues.mask[i]:
-        qvalues[i]=rqvalues[j]
-        j += 1
+    #to enssure desencing order, each q-value is the minimum of it and those of larger p-values
+    rqvalues[rp_argsort] = np.minimum(np.minimum.accumulate(rqvalues[rp_argsort][::-1])[::-1], 1)
+
+    qvalues = np.full(p_num, np.nan)
+    qvalues[valid] = rqvalues
  
     #if np.all(np.isnan(qvalues)):
     #print method
@@ -686,48 +1182,33 @@ def tied_rank(values):
   """ rank values with ties, tie is ranked as the largest rank, now allow nans non-ranked
 
     Args:
-      values(1d np.ma.array): a numeric array
+      values(np.ma.array): a numeric array, a 2d array is ranked row by row
 
     Returns:
       one vector of asscendant ranks from 1
        ties are kept and label by largest rank 
   """
   assert type(values) == np.ma.MaskedArray
-  #print "values=", values
-  #print "values.mask=", values.mask
-  V = np.ma.asarray(values)
-    #print "nonzero(V.mask)=", np.nonzero(V.mask)
-    #print "V=", V
-    #print "V.mask=", V.mask
-  nans = (np.nonzero(V.mask)[0]).tolist()      #record indecies
-  V = V[~V.mask]                               #remove nan's
-  #print "V=", V
-
-  v_num = {}  #values and counts
-  v_cum = {}  #cumulated rank, take largest for tie
-  for v in V:
-    v_num[v] = v_num.get(v,0) + 1
-  suvs = list(v_num.keys())  #sorted unique pvaludes
-  suvs.sort() 
-  c = 0
-  for v in suvs:
-    c += v_num[v]
-    v_cum[v] = c
-  #print "sorted unique values=", suvs
-  #print "cumulative number=", v_cum
-  #print [ v_cum[values[i]] for i in xrange(0, len(values)) ]
-  sV = np.array( [ (2*v_cum[V[i]]-v_num[V[i]]+1)/2 for i in range(0, len(V)) ], dtype='float' ) #sorted V, break tie by average
-  #print "sV=", sV
-  #print "nans=", nans
-  
-  #if type(values) == np.ma.MaskedArray:
-    #mV = sV
-  for idx in nans:
-    sV = np.insert(sV, idx, np.nan)   #insert nan to original place, need return masked? yes
-  sV = np.ma.masked_invalid(sV,copy=True)
-  #print "sV=", sV
-
-  return sV 
+  V = np.ma.filled(np.ma.asarray(values, dtype='float'), np.nan)
+  return np.ma.masked_invalid(dense_tied_rank(V), copy=False)
+
+def dense_tied_rank(values):
+  """ tied_rank on a dense array, row by row if 2d, nans are not ranked and stay nans """
+  values = np.asarray(values, dtype='float')
+  order = np.argsort(values, axis=-1, kind='stable')  #nans sorted last
+  sV = np.take_along_axis(values, order, axis=-1)
+  pos = np.arange(1, values.shape[-1]+1)
+  first = np.ones(sV.shape, dtype='bool')   #first and last sorted positions of each tie
+  first[..., 1:] = sV[..., 1:] != sV[..., :-1]
+  last = np.ones(sV.shape, dtype='bool')
+  last[..., :-1] = first[..., 1:]
+  start = np.maximum.accumulate(np.where(first, pos, 0), axis=-1)
+  end = np.flip(np.minimum.accumulate(np.flip(np.where(last, pos, len(pos)), \
+      axis=-1), axis=-1), axis=-1)
+  ranks = np.empty(sV.shape, dtype='float')
+  np.put_along_axis(ranks, order, (start+end)/2, axis=-1)  #break tie by average
+  ranks[np.isnan(values)] = np.nan
+  return ranks
 
 #def	wholeNormalize(tseries):
 #  """	whole normalizing
@@ -863,6 +1344,91 @@ def noneNormalize(tseries):
   nt = tseries.filled(fill_value=0)   #filling zeros to nan, shall be no na's from here on
   return nt
 
+#dense counterparts of the replicate summarizing and normalizing functions,
+#on float arrays with nans instead of np.ma masked arrays, numerically the same;
+#leading axes are batches, e.g. all bootstraps of a pair at once
+
+def denseSimpleAverage(tseries):
+  """ simpleAverage on a dense array, nans are missing values """
+  return nan_average(nan_series(tseries), axis=-2)
+
+def denseSdAverage(tseries):
+  """ sdAverage on a dense array, nans are missing values """
+  X = nan_series(tseries)
+  sd = nan_std(X, axis=-2, ddof=1)
+  average = nan_average(X, axis=-2)
+  flat = np.any(np.isnan(sd) | (sd == 0), axis=-1, keepdims=True) #sd = 0, fall back to simpleAverage
+  with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+    weighted = average*(1/sd)*(1/np.sum(1/sd, axis=-1, keepdims=True))*(1/sd) #sd-weighted sample
+  return np.where(flat, average, weighted)
+
+def denseSimpleMedian(tseries):
+  """ simpleMedian on a dense array, nans are missing values """
+  return nan_median(nan_series(tseries), axis=-2)
+
+def denseMadMedian(tseries):
+  """ madMedian on a dense array, nans are missing values """
+  X = nan_series(tseries)
+  Xm = nan_median(X, axis=-2)
+  mad = nan_median(np.abs(X - np.expand_dims(Xm, -2)), axis=-2)
+  flat = np.any(np.isnan(mad) | (mad == 0), axis=-1, keepdims=True) #mad = 0, fall back to simpleMedian
+  with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+    weighted = Xm*(1/mad)*(1/np.sum(1/mad, axis=-1, keepdims=True))*(1/mad) #mad-weighted sample
+  return np.where(flat, Xm, weighted)
+
+def dense_percentile(tseries):
+  """ normal quantiles of the ranks of a dense series, nans stay nans """
+  ranks = dense_tied_rank(tseries)
+  return sp.stats.distributions.norm.ppf( ranks/(np.sum(~np.isnan(ranks), axis=-1, \
+      keepdims=True)+1) )
+
+def dense_filled(zt):
+  """ zeros filled to nans and infs, shall be no na's from here on """
+  return np.where(np.isfinite(zt), zt, 0.)
+
+def densePercentileNormalize(tseries):
+  """ percentileNormalize on a dense array, nans are missing values """
+  return dense_filled(dense_percentile(nan_series(tseries)))
+
+def densePercentileZNormalize(tseries):
+  """ percentileZNormalize on a dense array, nans are missing values """
+  nt = dense_percentile(nan_series(tseries))
+  return dense_filled(nan_divide(nt - np.expand_dims(nan_average(nt, axis=-1), -1), \
+      np.expand_dims(nan_std(nt, axis=-1), -1)))
+
+def denseRobustZNormalize(tseries):
+  """ robustZNormalize on a dense array, nans are missing values """
+  nt = dense_percentile(nan_series(tseries))
+  median = np.expand_dims(nan_median(nt, axis=-1), -1)
+  mad_sd = 1.4826 * nan_median(np.abs(nt - median), axis=-1)
+  range_sd = (np.nanmax(nt, axis=-1) - np.nanmin(nt, axis=-1))/4
+  sd_est = np.where(mad_sd == 0, range_sd, mad_sd)
+  return dense_filled(nan_divide(nt - median, np.expand_dims(sd_est, -1)))
+
+def denseNoZeroNormalize(tseries):
+  """ noZeroNormalize on a dense array, nans and zeros are missing values """
+  nt = nan_series(tseries)
+  nt = dense_percentile(np.where(nt == 0, np.nan, nt))
+  with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+    return dense_filled((nt - np.expand_dims(nan_average(nt, axis=-1), -1)) \
+        *(1/np.expand_dims(nan_std(nt, axis=-1), -1)))
+
+def denseNoneNormalize(tseries):
+  """ noneNormalize on a dense array, nans are missing values """
+  return dense_filled(nan_series(tseries))
+
+denseFunctions = { simpleAverage: denseSimpleAverage, sdAverage: denseSdAverage, \
+    simpleMedian: denseSimpleMedian, madMedian: denseMadMedian, \
+    noneNormalize: denseNoneNormalize, percentileNormalize: densePercentileNormalize, \
+    percentileZNormalize: densePercentileZNormalize, \
+    robustZNormalize: denseRobustZNormalize, noZeroNormalize: denseNoZeroNormalize }
+
+#rank based normalizations commute with shuffling the time spots,
+#permutation tests with these can be run on the normalized series
+rankNormalizers = (percentileNormalize, percentileZNormalize, \
+    robustZNormalize, noZeroNormalize, densePercentileNormalize, \
+    densePercentileZNormalize, denseRobustZNormalize, denseNoZeroNormalize)
+
 def fillMissing(tseries, method): #teseries is 2d matrix unmasked
   """ fill missing data
 
@@ -896,11 +1462,159 @@ def fillMissing(tseries, method): #teseries is 2d matrix unmasked
 
     return yy
     
+def shareArray(a):
+  """ copy an array into a new shared memory block for worker processes
+
+    Return:
+      (shm, spec), the block to close and unlink when done and the
+      (name, shape, dtype) spec for attachArray
+  """
+  shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+  np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+  return (shm, (shm.name, a.shape, a.dtype.str))
+
+def attachArray(spec):
+  """ attach a shareArray block, return (shm, array) """
+  shm = shared_memory.SharedMemory(name=spec[0])
+  return (shm, np.ndarray(spec[1], dtype=spec[2], buffer=shm.buf))
+
+pairWorker = {}     # shared arrays and options of a worker process
+
+def initPairWorker(specs, options):
+  """ worker initializer, attach firstData, secondData, firstSeries, secondSeries """
+  pairWorker['shared'] = [ attachArray(spec) for spec in specs ]
+  pairWorker['arrays'] = [ a for (shm, a) in pairWorker['shared'] ]
+  pairWorker['options'] = options
+
+def runPairWorker(pairs):
+  """ pairwiseLSA of one tile of pairs in a worker process """
+  return pairwiseLSA(pairs, *pairWorker['arrays'], options=pairWorker['options'])
+
+def poolPairwiseLSA(pool, pairs, tileNum, interleave=False):
+  """ pairwiseLSA of pairs split into tiles over the workers of pool
+
+    Args:
+      pool(multiprocessing.Pool): workers set up by initPairWorker
+      pairs(list): (i, j) factor index pairs
+      tileNum(int): number of tiles
+      interleave(bool): tile every tileNum-th pair instead of consecutive pairs,
+        spreading pairs of uneven cost, as the promising pairs of -p mix are
+
+    Return:
+      the results of pairwiseLSA, in the order of pairs
+  """
+  if interleave:
+    tiles = [ np.arange(t, len(pairs), tileNum) for t in range(0, tileNum) ]
+  else:
+    tiles = np.array_split(np.arange(len(pairs)), tileNum)
+  tiles = [ tile for tile in tiles if len(tile) > 0 ]
+  results = [None]*len(pairs)
+  for (tile, tileResults) in zip(tiles, pool.imap(runPairWorker, \
+      [ [ pairs[k] for k in tile ] for tile in tiles ])):
+    for (k, result) in zip(tile, tileResults):
+      results[k] = result
+  return results
+
+def pairGenerator(seed, i, j):
+  """ the random stream of factor pair (i, j) in a run with seed, independent of
+      the other pairs, so any pair can be recomputed alone
+  """
+  return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i, j)))
+
+def pairwiseLSA(pairs, firstData, secondData, firstSeries, secondSeries, \
+    options, threads=1, screen=False):
+  """ LS scores, P-values and bootstrap CIs of usable factor pairs
+
+    Args:
+      pairs(list): (i, j) factor index pairs, or a pair_num x 2 array of them
+      firstData(np.array): factor_num x replicate_num x timespot_num raw data, possibly nans
+      secondData(np.array): second factors raw data
+      firstSeries(np.array): normalized first factors, see normalizeFactors
+      secondSeries(np.array): normalized second factors
+      options(dict): delayLimit, pvalueMethod, precisionP, fTransform, zNormalize,
+        trendThresh, stopExceed, bootCI, bootNum, P_table, lengthSeries, stdX, replicates
+        and seed of applyAnalysis, and nullCache, a dict for sharedNull or None,
+        with firstNullPatterns and secondNullPatterns of the factors, see nullPatterns
+      threads(int): compcore threads for the LS scores
+      screen(bool): only LS scores and theoretical P-values, no permutation or
+        bootstrap, the first stage of -p mix
+
+    Return:
+      a list of (Smax, Sl, Su, Xs, Ys, Al, lsaP, permNum, tailFit), one per pair
+  """
+  delayLimit = options['delayLimit']
+  pvalueMethod = options['pvalueMethod']
+  lengthSeries = options['lengthSeries']
+  (scores, aligns) = batchLSA(firstSeries, secondSeries, pairs, delayLimit, threads)
+  if pvalueMethod in ['theo', 'mix']: #theoretical P-values of all pairs at once
+    theoP = readPvalue(options['P_table'], R=np.abs(scores)*lengthSeries, \
+        N=lengthSeries, x_sd=options['stdX'], M=options['replicates'], alpha=1., \
+        beta=1., x_decimal=my_decimal) #consider no extra zeros
+  results = []
+  for k in range(0, len(pairs)):
+    (i, j) = pairs[k]
+    Smax = float(scores[k])
+    (Xs, Ys, Al) = [ int(v) for v in aligns[k] ]
+    if Al == 0: #aligning nothing, no P-value or CI
+      results.append((0, 0, 0, -1, -1, 0, np.nan, 0, 0))
+      continue
+    if screen:
+      results.append((Smax, Smax, Smax, Xs, Ys, Al, theoP[k], 0, 0))
+      continue
+    rng = pairGenerator(options['seed'], i, j)
+
+    #np.ma.array(copy=True) to copy, otherwise is only reference
+    Xz = np.ma.masked_invalid(firstData[i], copy=True)
+    Yz = np.ma.masked_invalid(secondData[j], copy=True)
+    lsaP = -1 #needs to be defined in this scope
+    permNum = 0
+    tailFit = 0
+    if pvalueMethod in ['theo', 'mix']:
+      lsaP = theoP[k]
+
+    if (pvalueMethod in ['mix'] and lsaP<=promising_p) or (pvalueMethod in ['perm', 'tail']):
+      Xp = np.ma.array(Xz,copy=True)
+      Yp = np.ma.array(Yz,copy=True)
+      permNum = options['precisionP']
+      shared = options['nullCache'] is not None \
+          and options['firstNullPatterns'][i] is not None \
+          and options['secondNullPatterns'][j] is not None
+      if options['stopExceed'] > 0 and not shared and pvalueMethod != 'tail':
+        (lsaP, permNum) = seqPermuPvalue(Xp, Yp, delayLimit, options['precisionP'], \
+          options['stopExceed'], np.abs(Smax), options['fTransform'], \
+          options['zNormalize'], options['trendThresh'], xSeries=firstSeries[i], \
+          ySeries=secondSeries[j], rng=rng)  # do sequential Permutation Test
+      else:
+        if shared:
+          PP_set = sharedNull(options['firstNullPatterns'][i], \
+            options['secondNullPatterns'][j], lengthSeries, delayLimit, permNum, \
+            options['zNormalize'], options['seed'], options['nullCache'])  # do Permutation Test on the shared null
+        else:
+          PP_set = permuNull(Xp, Yp, delayLimit, permNum, options['fTransform'], \
+            options['zNormalize'], options['trendThresh'], xSeries=firstSeries[i], \
+            ySeries=secondSeries[j], rng=rng)  # do Permutation Test
+        if pvalueMethod == 'tail':
+          (lsaP, tailFit) = tailPvalue(PP_set, np.abs(Smax))
+        else:
+          lsaP = np.sum(permuExceed(PP_set, np.abs(Smax)))/float(permNum)
+
+    if options['bootNum'] > 0: #do BS
+      Xb = np.ma.array(Xz,copy=True)
+      Yb = np.ma.array(Yz,copy=True)
+      (Smax, Sl, Su) = bootstrapCI(Xb, Yb, Smax, delayLimit, options['bootCI'], \
+          options['bootNum'], options['fTransform'], options['zNormalize'], \
+          options['trendThresh'], rng=rng, threads=threads) # do Bootstrap CI
+    else: #skip BS
+      (Smax, Sl, Su) = (Smax, Smax, Smax)
+    results.append((Smax, Sl, Su, Xs, Ys, Al, lsaP, permNum, tailFit))
+  return results
+
 def applyAnalysis(firstData, secondData, onDiag=True, delayLimit=3, minOccur=.5, \
     bootCI=.95, bootNum=0, pvalueMethod='perm', precisionP=1000,\
     fTransform=simpleAverage, zNormalize=noZeroNormalize, approxVar=1, \
     resultFile=tempfile.TemporaryFile('w'), trendThresh=None,\
-    firstFactorLabels=None, secondFactorLabels=None, qvalueMethod='R', progressive=0):
+    firstFactorLabels=None, secondFactorLabels=None, qvalueMethod='R', progressive=0, \
+    threads=1, workers=1, seed=None, stopExceed=0, shareNull=False):
   """ calculate pairwise LS scores and p-values
 
     	Args:
@@ -910,9 +1624,14 @@ def applyAnalysis(firstData, secondData, onDiag=True, delayLimit=3, minOccur=.5,
     		delayLimit(int): 	maximum time unit of delayed response allowed
      		bootCI(float): 		bootstrap confidence interval size, 0 to 1
     		bootNum(int): 		bootstrap number
-    		pvalueMethod(int): 	pvalue estimation method and precision
+    		pvalueMethod(str): 	pvalue estimation method, 'perm', 'theo', 'mix' or 'tail'
     		ftransform(func): 	summarizing function for replicated data
     		znormalize(func): 	normalizing function for ftransformed data
+    		threads(int): 		compcore threads for the LS scores, 0 to use all cores
+    		workers(int): 		worker processes sharing the pairs, 1 to run serially
+    		seed(int): 		seed of the random streams of all pairs, drawn from np.random if None
+    		stopExceed(int): 	stop the permutations of a pair after this many exceedances, 0 to run all
+    		shareNull(bool): 	share permutation nulls between pairs, see sharedNull
     		
     	Returns:
     		A LSA table.
@@ -934,6 +1653,10 @@ def applyAnalysis(firstData, secondData, onDiag=True, delayLimit=3, minOccur=.5,
   col_labels= ['X','Y','LS','lowCI','upCI','Xs','Ys','Len','Delay',\
       'P','PCC','Ppcc','SPCC','Pspcc','Dspcc','SCC','Pscc','SSCC',\
       'Psscc','Dsscc','Q','Qpcc','Qspcc','Qscc','Qsscc','Xi','Yi']
+  if stopExceed > 0:  #report the permutations used by each pair
+    col_labels.insert(col_labels.index('Q'), 'Perms')
+  if pvalueMethod == 'tail':  #and how its P-value was obtained, see tailPvalue
+    col_labels.insert(col_labels.index('Q'), 'Pfit')
   print("\t".join(col_labels), file=resultFile)
 
   firstFactorNum = firstData.shape[0]
@@ -958,11 +1681,6 @@ def applyAnalysis(firstData, secondData, onDiag=True, delayLimit=3, minOccur=.5,
     pairwiseNum = firstFactorNum*secondFactorNum
   lsaTable = None
   #print(pairwiseNum)
-  pvalues = np.zeros(pairwiseNum, dtype='float')
-  pccpvalues = np.zeros(pairwiseNum, dtype='float')
-  spccpvalues = np.zeros(pairwiseNum, dtype='float')
-  sccpvalues = np.zeros(pairwiseNum, dtype='float')
-  ssccpvalues = np.zeros(pairwiseNum, dtype='float')
   #print factorNum, repNum, spotNum, lsaTable, pvalues
 
   timespots = secondSpotNum
@@ -979,6 +1697,7 @@ def applyAnalysis(firstData, secondData, onDiag=True, delayLimit=3, minOccur=.5,
   else:
     qvalue_func = storeyQvalue 
 
+  P_table = None
   if pvalueMethod in ['theo','mix']:
     #P_table = theoPvalue(D=0, precision=.0001, x_decimal=3)   
     #let's produce 2 tail-ed p-value
@@ -986,263 +1705,284 @@ def applyAnalysis(firstData, secondData, onDiag=True, delayLimit=3, minOccur=.5,
         precision=1./precisionP, x_decimal=my_decimal)
     #print P_table
   
+  print("normalizing factors...", file=sys.stderr)
+  (firstSeries, firstUsable) = normalizeFactors(firstData, fTransform, zNormalize, \
+      trendThresh, minOccur)
+  (secondSeries, secondUsable) = normalizeFactors(secondData, fTransform, zNormalize, \
+      trendThresh, minOccur)
+
+  firstAverage = ma_average_factors(firstData)
+  secondAverage = ma_average_factors(secondData)
+  wanted = np.logical_and.outer(firstUsable, secondUsable)
+  if onDiag:
+    wanted = np.triu(wanted, 1)
+
+  if seed == None:
+    seed = np.random.randint(0, 2**31)
+  print("random seed:", seed, file=sys.stderr)
+
+  options = { 'delayLimit': delayLimit, 'pvalueMethod': pvalueMethod, \
+      'precisionP': precisionP, 'fTransform': fTransform, 'zNormalize': zNormalize, \
+      'trendThresh': trendThresh, 'bootCI': bootCI, 'bootNum': bootNum, \
+      'P_table': P_table, 'lengthSeries': lengthSeries, 'stdX': stdX, \
+      'replicates': replicates, 'seed': seed, 'stopExceed': stopExceed, \
+      'nullCache': None }
+  if shareNull and trendThresh == None and zNormalize in rankNormalizers:
+    options['nullCache'] = {}
+    options['firstNullPatterns'] = nullPatterns(firstData, fTransform, zNormalize)
+    options['secondNullPatterns'] = nullPatterns(secondData, fTransform, zNormalize)
+  pool = None
+  if workers > 1:
+    print("starting", workers, "workers...", file=sys.stderr)
+    shared = [ shareArray(a) for a in (firstData, secondData, firstSeries, secondSeries) ]
+    pool = multiprocessing.Pool(workers, initPairWorker, \
+        ([ spec for (shm, spec) in shared ], options))
+
   print("pairwise calculation...", file=sys.stderr)
   start_time = time.time()
 
   ti = 0
+  permTotal = 0
+  (mixCounts, mixTimes) = ([0, 0, 0], [0., 0.]) #screened, promising, queued pairs
+  lsaTable = resultTable(col_labels, progressive if progressive>0 else pairwiseNum)
   if progressive>0:
-    lsaTable = [None]*progressive
-  else:
-    lsaTable = [None]*pairwiseNum
+    #rows are spilled without q-values, and their P-values, for a second pass
+    rowFile = tempfile.TemporaryFile(mode='w+')
+    pvalueSpill = np.memmap(tempfile.TemporaryFile(), dtype='float', mode='w+', \
+        shape=(max(pairwiseNum, 1), 5))
+    spilled = 0
 
-  for i in range(0, firstFactorNum):
-    Xz = np.ma.masked_invalid(firstData[i], copy=True) 
-    #need to convert to masked array with na's, not F-normalized
-    Xz_badOccur = np.sum(np.logical_not(np.isnan(ma_average(Xz)), \
-        ma_average(Xz)==0))/float(timespots) < minOccur
-    if Xz.shape[1] == None: #For 1-d array, convert to 2-d
-      Xz.shape = (1, Xz.shape[0])
-    for j in range(0, secondFactorNum):
-      if onDiag and i>=j:
-        continue   #only care lower triangle entries, ignore i=j entries
-      Yz = np.ma.masked_invalid(secondData[j], copy=True)    
-      # need to convert to masked array with na's, not F-normalized
-      Yz_badOccur = np.sum(np.logical_not(np.isnan(ma_average(Yz)), \
-          ma_average(Yz)==0))/float(timespots) < minOccur
-      #print i+1, np.sum(np.logical_not(np.isnan(ma_average(Xz)), ma_average(Xz)==0))/float(timespots), Xz_badOccur, \
-      #	    j+1, np.sum(np.logical_not(np.isnan(ma_average(Yz)), ma_average(Yz)==0))/float(timespots), Yz_badOccur
-      #if Yz_badOccur:
-	    #print ma_average(Yz), ma_average(Yz).mask, quit()
-      if Yz.shape[1] == None: #For 1-d array, convert to 2-d
-        Yz.shape = (1, Yz.shape[0])
-      #if i == 36 or j == 36:
-        #print "i=",i,"data=",firstData[i]
-        #print "j=",j,"data=",secondData[j]
-        #print Xz, Yz
-        #print np.all(Yz.mask), np.all(Xz.mask), np.all(Yz.mask) or np.all(Xz.mask)
-      #control minZeroPercent or allNA here
-      
-      if np.all(Yz.mask) or np.all(Xz.mask) or Xz_badOccur or Yz_badOccur:  
-        # not any unmasked value in Xz or Yz, all nan in input, warn code -1
-        # lsaTable[ti] = [i, j, Smax,   Sl,     Su,     Xs,Ys,Al,Xs-Ys, lsaP,   PCC,    P_PCC,  SPCC,   P_SPCC, D_SPCC, SCC,    P_SCC,  SSCC,   P_SSCC, D_SSCC]
-        lsaTable[ti] =[i, j, 0, 0, 0, -2, -2, 0, 0, \
-            1, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, \
-            np.nan, np.nan, np.nan, np.nan]
-        pvalues[ti] = np.nan
-        pccpvalues[ti] = np.nan
-        spccpvalues[ti] = np.nan
-        sccpvalues[ti] = np.nan
-        ssccpvalues[ti] = np.nan
-        #print "lsa computing..."
-        #try:
-        #print "Xf%d="%i, Xz
-        #print "Xz%d="%i, zNormalize(fTransform(Xz))
-        #print "Xf%d="%j, Yz
-        #print "Xz%d="%j, zNormalize(fTransform(Yz))
-        #print >>sys.stderr, "can get here?"
+  try:
+    if pvalueMethod == 'mix':
+      #screen all usable pairs by theoretical P-values, then permute the promising ones,
+      #and the rest too if they need bootstrap, as one queue; row-major as in the blocks
+      usable = np.argwhere(wanted)
+      stage_time = time.time()
+      mixResults = pairwiseLSA(usable, firstData, secondData, firstSeries, \
+          secondSeries, options, threads, screen=True)
+      queue = [ k for (k, result) in enumerate(mixResults) if result[5] > 0 \
+          and (result[6] <= promising_p or bootNum > 0) ]
+      mixCounts = [ len(usable), sum( mixResults[k][6] <= promising_p for k in queue ), \
+          len(queue) ]
+      mixTimes[0] = time.time() - stage_time
+      stage_time = time.time()
+      queuePairs = [ (int(usable[k, 0]), int(usable[k, 1])) for k in queue ]
+      if pool is None:
+        queueResults = pairwiseLSA(queuePairs, firstData, secondData, firstSeries, \
+            secondSeries, options, threads)
       else:
-        LSA_result = singleLSA(Xz, Yz, delayLimit, fTransform, zNormalize, \
-          trendThresh, True) #now allowing trend analysis in singleLSA
-        #print >>sys.stderr, "can get here?"
-        #else:
-        #  LSA_result = singleLTA(Xz, Yz, delayLimit, fTransform, ZNormalize, \
-        #      trendThresh, True) 
-        #except NotImplementedError:
-        #  print "Xz=", Xz
-        #  print "Yz=", Yz
-        #  quit()
-
-          
-        Smax = LSA_result.score 
-        #if np.isnan(Smax):
-        #  print "error" 
-        #  quit()
-        Al = len(LSA_result.trace)
-        (PCC, P_PCC) = calc_pearsonr(ma_average(Xz, axis=0), ma_average(Yz, axis=0)) 
-        # it is two tailed p-value
-        (SCC, P_SCC) = calc_spearmanr(ma_average(Xz, axis=0), ma_average(Yz, axis=0)) 
-        try:
-          (SPCC, P_SPCC, D_SPCC) = calc_shift_corr(ma_average(Xz, axis=0), \
-            ma_average(Yz, axis=0), delayLimit, calc_pearsonr) 
-          # corr for shifted-cut seq
-          (SSCC, P_SSCC, D_SSCC) = calc_shift_corr(ma_average(Xz, axis=0), \
-            ma_average(Yz, axis=0), delayLimit, calc_spearmanr) 
-          # corr for shifted-cut seq
-          #if np.isnan(SSCC) or np.isnan(SPCC): 
-          #  print "Al=", Al, "X shape", Xz.shape, "Y shape", Yz.shape
-          #  print "Xs=", Xs, X_seg.shape
-          #  print "Ys=", Ys, Y_seg.shape
-          #  quit()
-        except FloatingPointError:
-          (SPCC, P_SPCC, D_SPCC) = (np.nan, np.nan, np.nan)
-          (SSCC, P_SSCC, D_SSCC) = (np.nan, np.nan, np.nan)
-          #print np.ma.mean(Xz[:,:Al], axis=0), np.ma.mean(Xz[:,:Al], axis=0).mask, \
-          #  np.ma.mean(Yz[:,(Ys-Xs):(Ys-Xs+Al)], axis=0), np.ma.mean(Yz[:,(Ys-Xs):(Ys-Xs+Al)], axis=0).mask
-          #quit()
-        pccpvalues[ti] = P_PCC
-        spccpvalues[ti] = P_SPCC
-        try:
-          sccpvalues[ti] = P_SCC
-        except ValueError:
-          #print "error at lsalib P_SCC", P_SCC  #sometimes produce [], why?
-          sccpvalues[ti] = np.nan
-        ssccpvalues[ti] = P_SSCC
-
-        if Al == 0: #handel possibility of aligning nothing, usually too many nas' or zeros
-          #(SCC, P_SCC) = calc_spearmanr(ma_average(Xz, axis=0), ma_average(Yz, axis=0), statlib.stats.lspearmanr)
-          pvalues[ti] = np.nan
-          #lsaTable[ti] = [i, j, Smax,   Sl,     Su,     Xs,Ys,Al,Xs-Ys, lsaP,   PCC, P_PCC,  SPCC,   P_SPCC, D_SPCC, SCC, P_SCC,  SSCC, P_SSCC, D_SSCC]
-          lsaTable[ti] =  [i, j, 0, 0, 0, -1, -1, 0, 0,\
-            1, PCC, P_PCC,  SPCC, P_SPCC, D_SPCC, \
-            SCC, P_SCC, SSCC, P_SSCC, D_SSCC]
-        else:
-          (Xs, Ys, Al) = (LSA_result.trace[Al-1][0], \
-            LSA_result.trace[Al-1][1], len(LSA_result.trace))
-          #try:
-          #  (Xs, Ys, Al) = (LSA_result.trace[Al-1][0], LSA_result.trace[Al-1][1], len(LSA_result.trace))
-          #except IndexError:
-          #  print "Xz=", Xz
-          #  print "Yz=", Yz
-          #  print "Xs=", Xs, "Ys=", Ys, "Al=", Al  
-          #  quit()
-          #print "PPC..." 
-          #print np.mean(Xz, axis=0), np.mean(Yz, axis=0)
-
-          #if Xs <= Ys:
-            #print Xz[:,:Al].shape
-            #print Yz[:,(Ys-Xs):(Ys-Xs)+Al].shape
-          #  X_seg = Xz[:,:(Xz.shape[1]-(Ys-Xs))]
-          #  Y_seg = Yz[:,(Ys-Xs):Yz.shape[1]]
-          #else:
-          #  X_seg = Xz[:,(Xs-Ys):Xz.shape[1]]
-          #  Y_seg = Yz[:,:(Yz.shape[1]-(Xs-Ys))]
-          #print "Al=", Al, "X shape", Xz.shape, "Y shape", Yz.shape
-          #print "Xs=", Xs, X_seg.shape
-          #print "Ys=", Ys, Y_seg.shape
-          #if Xs != Ys:
-          #  quit()
-
-
-          #This Part Must Follow Static Calculation Part
-          #Otherwise Yz may be changed, now it is copied
-          #np.ma.array(copy=True) to copy, otherwise is only reference
-          promisingP = 0.05 #this is according to convention of P-value
-          lsaP = -1 #needs to be defined in this scope
-          if pvalueMethod in ['theo', 'mix']:
-            #x = np.abs(Smax)*np.sqrt(timespots) # x=Rn/sqrt(n)=Smax*sqrt(n)
-            #alpha=1-{#(nan+zeros)/timespots}
-            #Xz_alpha = 1 - np.sum(zNormalize(fTransform(Xz))==0)/float(timespots)
-            #Yz_beta = 1 - np.sum(zNormalize(fTransform(Yz))==0)/float(timespots)
-            #if Xz_alpha==0 or Yz_beta==0:
-            #  lsaP = np.nan
-            #else:
-            lsaP = readPvalue(P_table, R=np.abs(Smax)*lengthSeries, \
-                N=lengthSeries, x_sd=stdX, M=replicates, alpha=1., \
-                beta=1., x_decimal=my_decimal) #consider no extra zeros
-
-          if (pvalueMethod in ['mix'] and lsaP<=promisingP) or (pvalueMethod in ['perm']):
-            Xp = np.ma.array(Xz,copy=True)
-            Yp = np.ma.array(Yz,copy=True)
-            lsaP = permuPvalue(Xp, Yp, delayLimit, precisionP, np.abs(Smax), \
-              fTransform, zNormalize, trendThresh)  # do Permutation Test
-
-          #print(pvalueMethod)
-          #print(lsaP)
-
-          pvalues[ti] = lsaP
-          #print "bootstrap computing..."
-          if bootNum > 0: #do BS
-            Xb = np.ma.array(Xz,copy=True)
-            Yb = np.ma.array(Yz,copy=True)
-            (Smax, Sl, Su) = bootstrapCI(Xb, Yb, Smax, delayLimit, \
-                bootCI, bootNum, fTransform, zNormalize, trendThresh) # do Bootstrap CI
-          else: #skip BS
-            (Smax, Sl, Su) = (Smax, Smax, Smax)
-
-          #uncomment to verify Xz, Yz unchanged by bootstrap and permutation
-          #print 'i=',i,"Data=",firstData[i],"Xz=",Xz,"mask=",Xz.mask, "mask_invalid=", np.ma.masked_invalid(firstData[i])
-          #print 'j=',j,"Data=",secondData[j],"Yz=",Yz,"mask=",Yz.mask, "mask_invalid=", np.ma.masked_invalid(secondData[j])
-          #print ma_average(Xz, axis=0), "mask=", ma_average(Xz, axis=0).mask
-          #print ma_average(Yz, axis=0), "mask=", ma_average(Yz, axis=0).mask
-          #print sp.stats.pearsonr(ma_average(Xz, axis=0), ma_average(Yz, axis=0))
-          #quit()
-
-          # need +epsilon to avoid all zeros
-          lsaTable[ti] = [i, j, Smax, Sl, Su, Xs, Ys, Al, Xs-Ys, lsaP, PCC, P_PCC, \
-              SPCC, P_SPCC, D_SPCC, SCC, P_SCC, SSCC, P_SSCC, D_SSCC]
-          #END IF AL==0
-        #END IF np.all
-        del LSA_result
-
-      if progressive>0 and (ti+1)%progressive == 0: #print every 0:porgressive-1 terms and reset lsaTable and ti
-        elapsed_time = time.time() - start_time
-        pct = float(i*secondFactorNum+j+1)/(firstFactorNum*secondFactorNum)
-        print(i*secondFactorNum+j+1, " of ", (onDiag)*firstFactorNum*(firstFactorNum-1)/2+(not onDiag)*firstFactorNum*secondFactorNum, ", ", \
-          pct*100, "%", "estimated remaining time", round(elapsed_time/pct*(1-pct)), "s", file=sys.stderr)
-        for row in lsaTable:
-          if row != None:
-            row=row+[np.nan,np.nan,np.nan,np.nan,np.nan] # shorter than labels, make up
-            print("\t".join(['%s']*len(col_labels)) % \
-              tuple( [firstFactorLabels[row[0]], secondFactorLabels[row[1]]] \
-              + ["%f" % np.round(v, decimals=disp_decimal) \
-              if isinstance(v, float) else v for v in row[2:]] \
-              + [row[0]+1, row[1]+1] ), file=resultFile)
-        lsaTable = [None]*progressive
-        ti=0
+        queueResults = poolPairwiseLSA(pool, queuePairs, workers*pair_tiles, interleave=True)
+      for (k, result) in zip(queue, queueResults):
+        mixResults[k] = result
+      mixTimes[1] = time.time() - stage_time
+      mixNext = 0 #first result of the next block
+
+    for b in range(0, firstFactorNum, corr_block):
+      #PCC and SCC of the next block of rows by matrix products
+      block = slice(b, min(b+corr_block, firstFactorNum))
+      (PCCs, P_PCCs) = calc_corr_matrix(firstAverage[block], secondAverage, \
+          'pearson', wanted[block])
+      (SCCs, P_SCCs) = calc_corr_matrix(firstAverage[block], secondAverage, \
+          'spearman', wanted[block])
+      # corr for shifted-cut seq
+      (SPCCs, P_SPCCs, D_SPCCs) = calc_shift_corr_matrix(firstAverage[block], \
+          secondAverage, delayLimit, 'pearson', wanted[block])
+      (SSCCs, P_SSCCs, D_SSCCs) = calc_shift_corr_matrix(firstAverage[block], \
+          secondAverage, delayLimit, 'spearman', wanted[block])
+
+      #LS scores, P-values and CIs of the block's usable pairs, split into tiles for the workers
+      blockPairs = [ (i, j) for i in range(block.start, block.stop) \
+          for j in range(0, secondFactorNum) if not (onDiag and i>=j) ]
+      usablePairs = [ (i, j) for (i, j) in blockPairs if wanted[i, j] ]
+      if pvalueMethod == 'mix': #results of the global stages above
+        lsaResults = dict(zip(usablePairs, mixResults[mixNext:mixNext+len(usablePairs)]))
+        mixNext += len(usablePairs)
+      elif pool is None:
+        lsaResults = dict(zip(usablePairs, pairwiseLSA(usablePairs, firstData, \
+            secondData, firstSeries, secondSeries, options, threads)))
       else:
-        ti += 1
-
-  if progressive>0: #print remaining entries
-    for row in lsaTable:
-      if row != None:
-        row=row+[np.nan,np.nan,np.nan,np.nan,np.nan] # shorter than labels, make up
-        print("\t".join(['%s']*len(col_labels)) % \
-          tuple( [firstFactorLabels[row[0]], secondFactorLabels[row[1]]] \
-          + ["%f" % np.round(v, decimals=disp_decimal) \
-          if isinstance(v, float) else v for v in row[2:]] \
-          + [row[0]+1, row[1]+1] ), file=resultFile)
+        lsaResults = dict(zip(usablePairs, poolPairwiseLSA(pool, usablePairs, \
+            workers*pair_tiles)))
+
+      for (i, j) in blockPairs:
+        if (i, j) not in lsaResults:
+          # not any unmasked value in Xz or Yz, all nan in input, or not occuring enough, warn code -1
+          # lsaTable[ti] = [i, j, Smax,   Sl,     Su,     Xs,Ys,Al,Xs-Ys, lsaP,   PCC,    P_PCC,  SPCC,   P_SPCC, D_SPCC, SCC,    P_SCC,  SSCC,   P_SSCC, D_SSCC]
+          # P is kept as nan for the q-values and reported as 1, see formatRows
+          row = [i, j, 0, 0, 0, -2, -2, 0, 0, \
+              np.nan, np.nan, np.nan, np.nan, np.nan, d_nan, np.nan, \
+              np.nan, np.nan, np.nan, d_nan]
+          (permNum, tailFit) = (0, 0)
+        else:
+          (Smax, Sl, Su, Xs, Ys, Al, lsaP, permNum, tailFit) = lsaResults[(i, j)]
+          k = i - block.start
+          (PCC, P_PCC) = (PCCs[k, j], P_PCCs[k, j])
+          # it is two tailed p-value
+          (SCC, P_SCC) = (SCCs[k, j], P_SCCs[k, j])
+          (SPCC, P_SPCC, D_SPCC) = (SPCCs[k, j], P_SPCCs[k, j], D_SPCCs[k, j])
+          (SSCC, P_SSCC, D_SSCC) = (SSCCs[k, j], P_SSCCs[k, j], D_SSCCs[k, j])
+
+          if Al == 0: #handel possibility of aligning nothing, usually too many nas' or zeros
+            #row = [i, j, Smax,   Sl,     Su,     Xs,Ys,Al,Xs-Ys, lsaP,   PCC, P_PCC,  SPCC,   P_SPCC, D_SPCC, SCC, P_SCC,  SSCC, P_SSCC, D_SSCC]
+            row = [i, j, 0, 0, 0, -1, -1, 0, 0,\
+              np.nan, PCC, P_PCC,  SPCC, P_SPCC, D_SPCC, \
+              SCC, P_SCC, SSCC, P_SSCC, D_SSCC]
+          else:
+            row = [i, j, Smax, Sl, Su, Xs, Ys, Al, Xs-Ys, lsaP, PCC, P_PCC, \
+                SPCC, P_SPCC, D_SPCC, SCC, P_SCC, SSCC, P_SSCC, D_SSCC]
+        if stopExceed > 0:
+          row.append(permNum)
+          permTotal += permNum
+        if pvalueMethod == 'tail':
+          row.append(tailFit)
+        lsaTable[ti] = tuple(row) + (np.nan,)*5   #q-values come last
+
+        if progressive>0 and (ti+1)%progressive == 0: #print every 0:porgressive-1 terms and reset lsaTable and ti
+          elapsed_time = time.time() - start_time
+          pct = float(i*secondFactorNum+j+1)/(firstFactorNum*secondFactorNum)
+          print(i*secondFactorNum+j+1, " of ", (onDiag)*firstFactorNum*(firstFactorNum-1)/2+(not onDiag)*firstFactorNum*secondFactorNum, ", ", \
+            pct*100, "%", "estimated remaining time", round(elapsed_time/pct*(1-pct)), "s", file=sys.stderr)
+          spilled += spillRows(lsaTable[:ti+1], rowFile, pvalueSpill, spilled, \
+              firstFactorLabels, secondFactorLabels)
+          ti=0
+        else:
+          ti += 1
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+      for (shm, spec) in shared:
+        shm.close()
+        shm.unlink()
+  if stopExceed > 0:
+    print("permutations used:", permTotal, file=sys.stderr)
+  if pvalueMethod == 'mix':
+    print("mix screen:", mixCounts[0], "pairs in", round(mixTimes[0], 2), "s,", \
+        mixCounts[1], "with theoretical P-value <=", promising_p, file=sys.stderr)
+    print("mix permutation:", mixCounts[2], "queued pairs,", mixCounts[1], "permuted, in", \
+        round(mixTimes[1], 2), "s", file=sys.stderr)
+
+  if progressive>0: #spill remaining entries, then add the q-values of all
+    spilled += spillRows(lsaTable[:ti], rowFile, pvalueSpill, spilled, \
+        firstFactorLabels, secondFactorLabels)
+    writeSpilledRows(resultFile, rowFile, pvalueSpill, spilled, qvalue_func)
   else:
-    #print lsaTable
-    #print "qvalues ..."
-    #pvalues = np.ma.masked_invalid(pvalues)
-    #pccpvalues = np.ma.masked_invalid(pccpvalues)
-    #print "pvalues", pvalues, np.isnan(np.sum(pvalues))
-    #print "pccpvalues", pccpvalues, np.isnan(np.sum(pccpvalues))
-    #print "lsaP"
-    #qvalues = storeyQvalue( pvalues )
-    print("LS Qvalues...", file=sys.stderr)
-    qvalues = qvalue_func( pvalues )
-    #print "pccP"
-    #pccqvalues = storeyQvalue( pccpvalues )
-    print("PCC Qvalues...", file=sys.stderr)
-    pccqvalues = qvalue_func( pccpvalues )
-    #print "sccP"
-    #sccqvalues = storeyQvalue( sccpvalues )
-    print("SCC Qvalues...", file=sys.stderr)
-    sccqvalues = qvalue_func( sccpvalues )
-    #print "spccP"
-    #spccqvalues = storeyQvalue( spccpvalues )
-    print("SPCC Qvalues...", file=sys.stderr)
-    spccqvalues = qvalue_func( spccpvalues )
-    #print "ssccP"
-    #ssccqvalues = storeyQvalue( ssccpvalues )
-    print("SSCC Qvalues...", file=sys.stderr)
-    ssccqvalues = qvalue_func( ssccpvalues )
-
-    for k in range(0, len(qvalues)):
-      lsaTable[k].append( qvalues[k] )
-      lsaTable[k].append( pccqvalues[k] )
-      lsaTable[k].append( spccqvalues[k] )
-      lsaTable[k].append( sccqvalues[k] )
-      lsaTable[k].append( ssccqvalues[k] )
-    
-    #print lsaTable
-    for row in lsaTable:
-      print("\t".join(['%s']*len(col_labels)) % \
-      tuple( [firstFactorLabels[row[0]], secondFactorLabels[row[1]]] \
-          + ["%f" % np.round(v, decimals=disp_decimal) \
-              if isinstance(v, float) else v for v in row[2:]] \
-          + [row[0]+1, row[1]+1] ), file=resultFile)
+    for (name, Pcol, Qcol) in q_columns:
+      print(name, "Qvalues...", file=sys.stderr)
+      lsaTable[Qcol] = qvalue_func( lsaTable[Pcol] )
+
+    writeRows(resultFile, lsaTable, col_labels, firstFactorLabels, secondFactorLabels)
+
+def resultTable(col_labels, rowNum):
+  """ preallocated table of applyAnalysis results
+
+    Args:
+      col_labels(list): result columns, see applyAnalysis
+      rowNum(int): number of rows
+
+    Return:
+      a structured array with a field per column but Xi and Yi, typed by result_dtypes
+  """
+  return np.zeros(rowNum, dtype=[ (label, result_dtypes.get(label, 'float')) \
+      for label in col_labels if label not in ['Xi', 'Yi'] ])
+
+def formatColumn(values, fmt):
+  """ strings of a column of values formatted by fmt, with one % operation """
+  return np.array(((fmt+"\t")*len(values) % tuple(values.tolist())).split("\t")[:-1], \
+      dtype='object')
+
+def formatRows(lsaTable, col_labels, firstFactorLabels, secondFactorLabels):
+  """ text of result rows, formatted column by column
+
+    Args:
+      lsaTable(np.array): result table, see resultTable
+      col_labels(list): columns to format, Xi and Yi from the factor indices
+      firstFactorLabels(list): labels of the first factors
+      secondFactorLabels(list): labels of the second factors
+
+    Return:
+      the tab separated lines, each ending with a new line; rows of pairs aligning
+      nothing (Xs -1) or not analyzed (Xs -2) report LS, lowCI and upCI as 0 and P as 1
+  """
+  rowNum = len(lsaTable)
+  if rowNum == 0:
+    return ""
+  special = lsaTable['Xs'] < 0
+  fields = np.empty((rowNum, len(col_labels)), dtype='object')
+  for (c, label) in enumerate(col_labels):
+    if label == 'X':
+      fields[:, c] = np.array(firstFactorLabels, dtype='object')[lsaTable['X']]
+    elif label == 'Y':
+      fields[:, c] = np.array(secondFactorLabels, dtype='object')[lsaTable['Y']]
+    elif label in ['Xi', 'Yi']:
+      fields[:, c] = formatColumn(lsaTable[label[0]].astype('int')+1, "%d")
+    elif result_dtypes.get(label, 'float') != 'float':
+      fields[:, c] = formatColumn(lsaTable[label], "%d")
+      if label in ['Dspcc', 'Dsscc']:
+        fields[lsaTable[label] == d_nan, c] = 'nan'
+    else:
+      fields[:, c] = formatColumn(np.round(lsaTable[label], decimals=disp_decimal), "%f")
+      if label in ['LS', 'lowCI', 'upCI', 'P']:
+        fields[special, c] = '1' if label == 'P' else '0'
+  return ("\t".join(['%s']*len(col_labels))+"\n")*rowNum % tuple(fields.ravel().tolist())
+
+def writeRows(resultFile, lsaTable, col_labels, firstFactorLabels, secondFactorLabels):
+  """ write result rows in blocks of write_chunk rows, see formatRows """
+  for start in range(0, len(lsaTable), write_chunk):
+    resultFile.write(formatRows(lsaTable[start:start+write_chunk], col_labels, \
+        firstFactorLabels, secondFactorLabels))
+
+def spillRows(lsaTable, rowFile, pvalueSpill, start, firstFactorLabels, \
+    secondFactorLabels):
+  """ write rows of progressive output without their q-values, which need the
+      P-values of all pairs, see writeSpilledRows
+
+    Args:
+      lsaTable(np.array): rows of the current progressive chunk, see resultTable
+      rowFile(file): file of spilled rows
+      pvalueSpill(np.memmap): pair_num x 5 P-values of q_columns, float64 as in the table
+      start(int): rows spilled before
+      firstFactorLabels(list): labels of the first factors
+      secondFactorLabels(list): labels of the second factors
+
+    Return:
+      the number of rows spilled
+  """
+  labels = [ label for label in lsaTable.dtype.names if label[0] != 'Q' ] + ['Xi', 'Yi']
+  writeRows(rowFile, lsaTable, labels, firstFactorLabels, secondFactorLabels)
+  pvalueSpill[start:start+len(lsaTable)] = np.column_stack([ lsaTable[Pcol] \
+      for (name, Pcol, Qcol) in q_columns ])
+  return len(lsaTable)
+
+def writeSpilledRows(resultFile, rowFile, pvalueSpill, rowNum, qvalue_func):
+  """ second pass of progressive output, q-values of the spilled P-values are
+      inserted before the factor indices of the spilled rows
+
+    Args:
+      resultFile(file): file to write the rows to
+      rowFile(file): file of spilled rows, see spillRows
+      pvalueSpill(np.memmap): pair_num x 5 spilled P-values
+      rowNum(int): number of spilled rows
+      qvalue_func(func): q-value function of a P-value array
+  """
+  qvalueSpill = np.memmap(tempfile.TemporaryFile(), dtype='float', mode='w+', \
+      shape=pvalueSpill.shape)
+  for (k, (name, Pcol, Qcol)) in enumerate(q_columns):
+    print(name, "Qvalues...", file=sys.stderr)
+    qvalueSpill[:rowNum, k] = qvalue_func( np.array(pvalueSpill[:rowNum, k], dtype='float') )
+  rowFile.seek(0)
+  for start in range(0, rowNum, write_chunk):
+    lines = [ rowFile.readline().rstrip('\n').rsplit('\t', 2) \
+        for k in range(start, min(start+write_chunk, rowNum)) ]
+    fields = np.empty((len(lines), 3+len(q_columns)), dtype='object')
+    fields[:, 0] = [ line[0] for line in lines ]
+    for k in range(0, len(q_columns)):
+      fields[:, 1+k] = formatColumn(np.round(qvalueSpill[start:start+len(lines), k], \
+          decimals=disp_decimal), "%f")
+    fields[:, -2:] = [ line[1:] for line in lines ]
+    resultFile.write(("\t".join(['%s']*fields.shape[1])+"\n")*len(lines) \
+        % tuple(fields.ravel().tolist()))
+  rowFile.close()
 
 #### trend analysis functions ####
 def ji_calc_trend(oSeries, lengthSeries, thresh):
@@ -1273,6 +2013,15 @@ def ji_calc_trend(oSeries, lengthSeries, thresh):
   #exit()
   return tSeries
 
+def ji_calc_trends(oSeries, thresh):
+  """ ji_calc_trend of every row of oSeries at once, row length is the series length """
+  (before, after) = (oSeries[..., :-1], oSeries[..., 1:])
+  with np.errstate(invalid='ignore', divide='ignore'):
+    trend = np.where(before == 0, np.sign(after), (after-before)/np.abs(before))
+  tSeries = np.where(trend >= thresh, 1., np.where(trend <= -thresh, -1., 0.))
+  tSeries[np.isnan(trend)] = np.nan
+  return tSeries
+
 #def ji_calc_trend_rep(oSeries, thresh): #sim trend series with replicates
  #Liping Ji and Kian-Lee Tan, Bioinformatics 2005
 #
@@ -1630,14 +2379,13 @@ def test():
   sa1 = simpleAverage(masked_data[1])
   print("simpleAverage of masked_data[1]:", sa1, sa1.mask, file=sys.stderr)
   print("input data:", noZeroNormalize(simpleAverage(masked_data[1])), file=sys.stderr)
-  lsar=singleLSA(masked_data[0], masked_data[1], delayLimit=1, fTransform=simpleAverage, zNormalize=noZeroNormalize, keepTrace=True)
-  print("lsar.score=", lsar.score, file=sys.stderr) 
-  Al=len(lsar.trace)
-  print("lsar.align=",(lsar.trace[Al-1][0], lsar.trace[Al-1][1], len(lsar.trace)), file=sys.stderr) 
+  (Smax, Xs, Ys, Al)=singleLSA(masked_data[0], masked_data[1], delayLimit=1, fTransform=simpleAverage, zNormalize=noZeroNormalize)
+  print("lsar.score=", Smax, file=sys.stderr) 
+  print("lsar.align=",(Xs, Ys, Al), file=sys.stderr) 
   print("---bootstrapCI---", file=sys.stderr)
-  print("Bset=", bootstrapCI(masked_data[0], masked_data[1], lsar.score, 1, .95, 2, simpleAverage, noZeroNormalize), file=sys.stderr)
+  print("Bset=", bootstrapCI(masked_data[0], masked_data[1], Smax, 1, .95, 2, simpleAverage, noZeroNormalize), file=sys.stderr)
   print("---permuPvalue---", file=sys.stderr)
-  print("P=", permuPvalue(masked_data[1], masked_data[0], 1, 2, np.abs(lsar.score), simpleAverage, noZeroNormalize), file=sys.stderr)
+  print("P=", permuPvalue(masked_data[1], masked_data[0], 1, 2, np.abs(Smax), simpleAverage, noZeroNormalize), file=sys.stderr)
   print("---PCC---", file=sys.stderr)
   (nPCC, nP_PCC) = sp.stats.pearsonr(np.mean(np.nan_to_num(test_data[0]), axis=0), np.mean(np.nan_to_num(test_data[1]), axis=0))
   oPCC = sp.corrcoef( np.mean(np.nan_to_num(test_data[0]),axis=0), np.mean(np.nan_to_num(test_data[1]),axis=0) )[0,1]
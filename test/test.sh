@@ -18,6 +18,36 @@ lsa_compute ../test/ARISA20.csv ../test/ARISA20.perm.lsa -r 1 -s 127 -d 3 -p per
 
 # 不对，这里是输入两个文件，然后输出结果是中间的那个 ../test/ARISA20.perm.lsa
 
+# Current Option Tests
+echo "Option Tests"
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.stop.lsa -r 1 -s 127 -d 3 -p perm -x 1000 -f none -n percentileZ -m 0 --seed 7 --stopExceed 20
+awk -F'\t' 'NR==1{for(i=1;i<=NF;i++) if($i=="Perms") c=i; next} $c>1000{n++} END{if(c && !n) print "--stopExceed Perms within -x"; else print "ERROR: --stopExceed Perms missing or over -x"}' ../test/ARISA20.stop.lsa
+
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.tail.lsa -r 1 -s 127 -d 3 -p tail -x 200 -f none -n percentileZ -m 0 --seed 7
+awk -F'\t' 'NR==1{for(i=1;i<=NF;i++) if($i=="Pfit") c=i; next} $c!=-1 && $c!=0 && $c!=1{n++} END{if(c && !n) print "-p tail Pfit in {-1,0,1}"; else print "ERROR: -p tail Pfit missing or out of {-1,0,1}"}' ../test/ARISA20.tail.lsa
+
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.threads1.lsa -r 1 -s 127 -d 3 -p theo -x 1000 -f none -n percentileZ -m 0 --threads 1
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.threads0.lsa -r 1 -s 127 -d 3 -p theo -x 1000 -f none -n percentileZ -m 0 --threads 0
+cmp ../test/ARISA20.threads1.lsa ../test/ARISA20.threads0.lsa && echo "--threads 0 matches --threads 1" || echo "ERROR: --threads 0 differs from --threads 1"
+lsa_compute ../test/testna.txt ../test/testna.s0.lsa -r 2 -s 0 -d 0 -x 30 # no spots, no pairs to align, -2 rows only
+awk -F'\t' 'NR>1 && $6!=-2{n++} END{if(NR>1 && !n) print "-s 0 writes -2 rows"; else print "ERROR: -s 0 does not write -2 rows"}' ../test/testna.s0.lsa
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.seed.lsa -r 1 -s 127 -d 3 -p perm -x 100 -f none -n percentileZ -m 0 --seed 7
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.seed2.lsa -r 1 -s 127 -d 3 -p perm -x 100 -f none -n percentileZ -m 0 --seed 7
+cmp ../test/ARISA20.seed.lsa ../test/ARISA20.seed2.lsa && echo "--seed 7 reproduces its run" || echo "ERROR: --seed 7 does not reproduce its run"
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.w2.lsa -r 1 -s 127 -d 3 -p perm -x 100 -f none -n percentileZ -m 0 --seed 7 -w 2
+cmp ../test/ARISA20.seed.lsa ../test/ARISA20.w2.lsa && echo "-w 2 matches the serial run" || echo "ERROR: -w 2 differs from the serial run"
+lsa_compute ../test/testrep.txt ../test/testrep.masked.lsa -r 5 -s 20 -d 3 -n pnz -t SD -x 20 -m 0 --seed 7
+lsa_compute ../test/testrep.txt ../test/testrep.dense.lsa -r 5 -s 20 -d 3 -n pnz -t SD -x 20 -m 0 --seed 7 --dense
+cmp ../test/testrep.masked.lsa ../test/testrep.dense.lsa && echo "--dense matches the masked run" || echo "ERROR: --dense differs from the masked run"
+lsa_compute ../test/testna.txt ../test/testna.masked.lsa -r 2 -s 4 -d 0 -x 30 -t Med --seed 7
+lsa_compute ../test/testna.txt ../test/testna.dense.lsa -r 2 -s 4 -d 0 -x 30 -t Med --seed 7 --dense
+cmp ../test/testna.masked.lsa ../test/testna.dense.lsa && echo "--dense matches the masked run with NAs" || echo "ERROR: --dense differs from the masked run with NAs"
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.prog.lsa -r 1 -s 127 -d 3 -p perm -x 100 -f none -n percentileZ -m 0 --seed 7 -v 37
+cmp ../test/ARISA20.seed.lsa ../test/ARISA20.prog.lsa && echo "-v 37 matches the in-memory run" || echo "ERROR: -v 37 differs from the in-memory run"
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.share.lsa -r 1 -s 127 -d 3 -p perm -x 100 -f none -n percentileZ -m 0 --seed 7 --shareNull
+lsa_compute ../test/ARISA20.csv ../test/ARISA20.share.w2.lsa -r 1 -s 127 -d 3 -p perm -x 100 -f none -n percentileZ -m 0 --seed 7 --shareNull -w 2
+cmp ../test/ARISA20.share.lsa ../test/ARISA20.share.w2.lsa && echo "--shareNull -w 2 matches the serial run" || echo "ERROR: --shareNull -w 2 differs from the serial run"
+
 # Current LA Tests
 #echo "ELA Tests"
 #lsa_compute ../test/ARISA20.csv ../test/ARISA20.lsa -r 1 -s 127 -d 3 -p theo -x 1000 -f linear -n percentileZ -e ../test/ARISA20.csv -m 0